@@ -1,5 +1,5 @@
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Response
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta, timezone
@@ -129,7 +129,7 @@ async def logout(response: Response, current_user: User = Depends(get_current_us
     return {"message": "Successfully logged out"}
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user_in: UserCreate) -> Any:
+async def register_user(user_in: UserCreate, background_tasks: BackgroundTasks) -> Any:
     """
     Register new user
     
@@ -152,8 +152,8 @@ async def register_user(user_in: UserCreate) -> Any:
     
     token = user.generate_verification_token()
     
-    # Send verification email
-    EmailService.send_verification_email(user.email, token)
+    # Send verification email after the response goes out
+    background_tasks.add_task(EmailService.send_verification_email, user.email, token)
 
     return user
 
@@ -232,7 +232,7 @@ def verify_email(response: Response, token: str):
         )
 
 @router.post("/resend-verification")
-def resend_verification_email(request: ResendRequest):
+def resend_verification_email(request: ResendRequest, background_tasks: BackgroundTasks):
     """
     Resend verification email
     """
@@ -249,13 +249,13 @@ def resend_verification_email(request: ResendRequest):
     # Generate new token
     token = user.generate_verification_token()
     
-    # Send verification email
-    EmailService.send_verification_email(user.email, token)
+    # Send verification email after the response goes out
+    background_tasks.add_task(EmailService.send_verification_email, user.email, token)
     
     return {"message": "Verification email sent"}
 
 @router.post("/forgot-password")
-async def forgot_password(request: ForgotPasswordRequest):
+async def forgot_password(request: ForgotPasswordRequest, background_tasks: BackgroundTasks):
     """
     Send password reset email
     """
@@ -276,8 +276,8 @@ async def forgot_password(request: ForgotPasswordRequest):
         # Generate reset token
         token = user.generate_reset_password_token()
         
-        # Send reset email
-        EmailService.send_password_reset_email(user.email, token)
+        # Send reset email after the response goes out
+        background_tasks.add_task(EmailService.send_password_reset_email, user.email, token)
         
         return {"message": success_message}
         
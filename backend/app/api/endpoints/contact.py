@@ -53,7 +53,7 @@ async def submit_contact_form(contact_data: ContactFormRequest):
     """
     try:
         # Send the contact form email
-        email_sent = EmailService.send_contact_form_email(
+        email_sent = await EmailService.send_contact_form_email(
             name=contact_data.name,
             email=contact_data.email,
             inquiry_type=contact_data.type,
@@ -2,8 +2,10 @@
 from contextlib import asynccontextmanager
 import json
 import asyncio
+import time
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, Depends, Response
+from mongoengine.context_managers import no_dereference
 from app.core.config import get_settings
 from app.db.models.auth import User
 from app.db.models.project import Project
@@ -12,7 +14,7 @@ from app.api.deps import get_current_user
 from typing import Optional
 from pydantic import BaseModel
 from app.services.ai.ai_utils import compact_json, create_llm
-from app.services.ai.sequence_diagram_service import SequenceDiagramGenerator, generate_sequence_diagram
+from app.services.ai.sequence_diagram_service import SequenceDiagramGenerator, generate_sequence_diagram, get_llm_fallback_metrics
 
 class DiagramRequest(BaseModel):
     project_id: str
@@ -26,6 +28,19 @@ router = APIRouter()
 settings = get_settings()
 
 
+def _load_diagram_inputs(project_id: str, *fields: str) -> Project:
+    """Load only the project fields a diagram prompt is built from (no SVGs or unrelated plan sections)"""
+    project = Project.objects(id=ObjectId(project_id)).only(*fields).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+
+def _store_diagram(project_id: str, **fields) -> None:
+    """Write generated diagram fields with a single $set instead of saving the whole project back"""
+    Project.objects(id=ObjectId(project_id)).update_one(**{f"set__{name}": value for name, value in fields.items()})
+
+
 @router.get("/sequence/{project_id}", response_class=SVGResponse)
 async def get_sequence_diagram(
     project_id: str,
@@ -35,7 +50,10 @@ async def get_sequence_diagram(
     Get existing sequence diagram SVG for a project
     """
     try:
-        project = Project.objects(id=ObjectId(project_id)).first()
+        # Only the access fields and the requested SVG are read, not the other diagrams and plan sections.
+        # References stay as DBRefs (which expose .id), so the access check never loads the User documents
+        with no_dereference(Project):
+            project = Project.objects(id=ObjectId(project_id)).only('owner_id', 'collaborator_ids', 'sequence_diagram_svg').first()
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -66,7 +84,10 @@ async def get_class_diagram(
     Get existing class diagram SVG for a project
     """
     try:
-        project = Project.objects(id=ObjectId(project_id)).first()
+        # Only the access fields and the requested SVG are read, not the other diagrams and plan sections.
+        # References stay as DBRefs (which expose .id), so the access check never loads the User documents
+        with no_dereference(Project):
+            project = Project.objects(id=ObjectId(project_id)).only('owner_id', 'collaborator_ids', 'class_diagram_svg').first()
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -97,7 +118,10 @@ async def get_activity_diagram(
     Get existing activity diagram SVG for a project
     """
     try:
-        project = Project.objects(id=ObjectId(project_id)).first()
+        # Only the access fields and the requested SVG are read, not the other diagrams and plan sections.
+        # References stay as DBRefs (which expose .id), so the access check never loads the User documents
+        with no_dereference(Project):
+            project = Project.objects(id=ObjectId(project_id)).only('owner_id', 'collaborator_ids', 'activity_diagram_svg').first()
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
@@ -137,7 +161,8 @@ async def diagram_service_status():
                 "reason": "circuit_breaker_open",
                 "message": "Service temporarily unavailable due to repeated failures. Will retry automatically.",
                 "failures": global_generator._circuit_breaker_failures,
-                "reset_time": global_generator._circuit_breaker_reset_time
+                # The breaker runs on a monotonic clock; report the reset as a wall-clock timestamp
+                "reset_time": time.time() + global_generator._seconds_until_retry()
             }
         elif global_generator._initialized:
             return {
@@ -158,6 +183,14 @@ async def diagram_service_status():
             "message": f"Error checking service status: {str(e)}"
         }
 
+
+@router.get("/metrics")
+async def diagram_llm_metrics():
+    """
+    Get the process-local LLM fallback counters for sequence diagram generation
+    """
+    return get_llm_fallback_metrics()
+
 @router.post("/sequence/create", response_class=SVGResponse)
 async def create_sequence_diagram(
     request: DiagramRequest,
@@ -168,9 +201,7 @@ async def create_sequence_diagram(
     Enhanced with comprehensive error handling and timeouts.
     """
     try:
-        project = Project.objects(id=ObjectId(request.project_id)).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        project = _load_diagram_inputs(request.project_id, 'description', 'technical_architecture')
         
         # Create the LLM with the configured settings
         llm = create_llm(temperature=settings.DIAGRAM_TEMPERATURE, model='gpt-4.1-mini', timeout=140)
@@ -234,9 +265,11 @@ async def create_sequence_diagram(
         svg_content = result.get("svg")
         
         # Save to database
-        project.sequence_diagram_source_code = result.get("diagram_source")
-        project.sequence_diagram_svg = svg_content
-        project.save() 
+        _store_diagram(
+            request.project_id,
+            sequence_diagram_source_code=result.get("diagram_source"),
+            sequence_diagram_svg=svg_content,
+        )
         
         return SVGResponse(content=svg_content)
     
@@ -259,9 +292,9 @@ async def update_sequence_diagram(
     Enhanced with comprehensive error handling and timeouts.
     """
     try:
-        project = Project.objects(id=ObjectId(request.project_id)).first()
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        project = _load_diagram_inputs(
+            request.project_id, 'description', 'technical_architecture', 'sequence_diagram_source_code'
+        )
         
         # Create the LLM with the configured settings
         llm = create_llm(temperature=settings.DIAGRAM_TEMPERATURE)
@@ -325,9 +358,11 @@ async def update_sequence_diagram(
         svg_content = result.get("svg")
 
         # Save to database
-        project.sequence_diagram_source_code = result.get("diagram_source")
-        project.sequence_diagram_svg = svg_content
-        project.save() 
+        _store_diagram(
+            request.project_id,
+            sequence_diagram_source_code=result.get("diagram_source"),
+            sequence_diagram_svg=svg_content,
+        )
         
         return SVGResponse(content=svg_content)
     
@@ -349,10 +384,7 @@ async def create_class_diagram(
     Create a new class diagram based on the project plan
     """
     try:
-        project = Project.objects(id=ObjectId(request.project_id)).first()
-
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        project = _load_diagram_inputs(request.project_id, 'description', 'data_models', 'technical_architecture')
 
         plan = project.description + "\n" + "Data Models" + compact_json(project.data_models) + "\n" + "System components:" + compact_json(project.technical_architecture.get("system_components"))
         # Generate the class diagram JSON representation
@@ -363,13 +395,11 @@ async def create_class_diagram(
             diagram_type="class"
         )
         
-        # Convert the JSON into an SVG
-        svg_content = generate_svg_from_json(diagram_json, "class")
+        # Convert the JSON into an SVG; Graphviz runs as a blocking subprocess, so keep it off the event loop
+        svg_content = await asyncio.to_thread(generate_svg_from_json, diagram_json, "class")
         
 
-        project.class_diagram_json = diagram_json
-        project.class_diagram_svg = svg_content
-        project.save()
+        _store_diagram(request.project_id, class_diagram_json=diagram_json, class_diagram_svg=svg_content)
 
         return SVGResponse(content=svg_content)
 
@@ -387,10 +417,7 @@ async def update_class_diagram(
     Update an existing class diagram based on the project plan and change request
     """
     try:
-        project = Project.objects(id=ObjectId(request.project_id)).first()
-
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        project = _load_diagram_inputs(request.project_id, 'description', 'technical_architecture', 'class_diagram_json')
 
         # Generate the updated class diagram JSON representation
         plan = project.description + "\n" + compact_json(project.technical_architecture)
@@ -402,12 +429,10 @@ async def update_class_diagram(
             diagram_type="class"
         )
         
-        # Convert the JSON into an SVG
-        svg_content = generate_svg_from_json(diagram_json, "class")
+        # Convert the JSON into an SVG; Graphviz runs as a blocking subprocess, so keep it off the event loop
+        svg_content = await asyncio.to_thread(generate_svg_from_json, diagram_json, "class")
         
-        project.class_diagram_json = diagram_json
-        project.class_diagram_svg = svg_content
-        project.save()
+        _store_diagram(request.project_id, class_diagram_json=diagram_json, class_diagram_svg=svg_content)
         
         return SVGResponse(content=svg_content)
     
@@ -425,10 +450,7 @@ async def create_activity_diagram(
     Create a new activity diagram based on the project plan
     """
     try:
-        project = Project.objects(id=ObjectId(request.project_id)).first()
-
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        project = _load_diagram_inputs(request.project_id, 'description', 'technical_architecture')
 
         # Generate the activity diagram JSON representation
         plan = project.description + "\n" + compact_json(project.technical_architecture)
@@ -440,12 +462,10 @@ async def create_activity_diagram(
             diagram_type="activity"
         )
         
-        # Convert the JSON into an SVG
-        svg_content = generate_svg_from_json(diagram_json, "activity")
+        # Convert the JSON into an SVG; Graphviz runs as a blocking subprocess, so keep it off the event loop
+        svg_content = await asyncio.to_thread(generate_svg_from_json, diagram_json, "activity")
         
-        project.activity_diagram_json = diagram_json
-        project.activity_diagram_svg = svg_content
-        project.save()
+        _store_diagram(request.project_id, activity_diagram_json=diagram_json, activity_diagram_svg=svg_content)
 
         return SVGResponse(content=svg_content)
 
@@ -463,10 +483,7 @@ async def update_activity_diagram(
     Update an existing activity diagram based on the project plan and change request
     """
     try:
-        project = Project.objects(id=ObjectId(request.project_id)).first()
-
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found")
+        project = _load_diagram_inputs(request.project_id, 'description', 'technical_architecture', 'activity_diagram_json')
 
         # Generate the updated activity diagram JSON representation
         plan = project.description + "\n" + compact_json(project.technical_architecture)
@@ -478,12 +495,10 @@ async def update_activity_diagram(
             diagram_type="activity"
         )
         
-        # Convert the JSON into an SVG
-        svg_content = generate_svg_from_json(diagram_json, "activity")
+        # Convert the JSON into an SVG; Graphviz runs as a blocking subprocess, so keep it off the event loop
+        svg_content = await asyncio.to_thread(generate_svg_from_json, diagram_json, "activity")
         
-        project.activity_diagram_json = diagram_json
-        project.activity_diagram_svg = svg_content
-        project.save()
+        _store_diagram(request.project_id, activity_diagram_json=diagram_json, activity_diagram_svg=svg_content)
         
         return SVGResponse(content=svg_content)
 
@@ -185,24 +185,27 @@ async def get_user_stats(current_user: User = Depends(get_current_user)):
         # Import here to avoid circular imports
         from app.db.models.project import Project
         
-        # Get all projects for the user
-        user_projects = Project.objects(owner_id=str(current_user.id))
-        
-        # Count projects by status
-        status_counts = {}
-        for project in user_projects:
-            project_status  = getattr(project, 'status', 'unknown')
-            status_counts[project_status ] = status_counts.get(project_status , 0) + 1
-        
         # Get recent project activity (last 30 days)
         from datetime import timedelta
         thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
         
+        # Read only the two fields the stats need, as raw PyMongo dicts, in a single pass
+        # (no plan/diagram payloads are transferred or built into Documents)
+        user_projects = Project.objects(owner_id=str(current_user.id)).only('status', 'created_at').as_pymongo()
+        
+        total_projects = 0
+        status_counts = {}
         recent_projects = 0
         for project in user_projects:
-            if hasattr(project, 'created_at'):
+            total_projects += 1
+            
+            # Count projects by status
+            project_status = project.get('status', 'draft')
+            status_counts[project_status] = status_counts.get(project_status, 0) + 1
+            
+            project_created_at = project.get('created_at')
+            if project_created_at is not None:
                 # Make project.created_at timezone-aware if it's naive
-                project_created_at = project.created_at
                 if project_created_at.tzinfo is None:
                     project_created_at = project_created_at.replace(tzinfo=timezone.utc)
                 
@@ -213,7 +216,7 @@ async def get_user_stats(current_user: User = Depends(get_current_user)):
         account_age_days = (datetime.now(timezone.utc) - current_user.created_at.replace(tzinfo=timezone.utc)).days
         
         return {
-            "total_projects": len(user_projects),
+            "total_projects": total_projects,
             "projects_by_status": status_counts,
             "recent_projects_30_days": recent_projects,
             "account_age_days": account_age_days,
@@ -1,18 +1,102 @@
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
-from mongoengine.queryset.visitor import Q
 from app.api.deps import get_current_user
 from app.db.models.auth import User
 from app.db.models.project import Project
-from app.utils.mongo_encoder import serialize_mongodb_doc
-from mongoengine.errors import DoesNotExist, InvalidQueryError
+from app.utils.mongo_encoder import MongoJSONResponse, serialize_mongodb_doc_bytes
+from mongoengine.errors import InvalidQueryError, ValidationError
 
 from app.utils.serializers import calculate_plan_metrics, get_structured_project
 
 router = APIRouter()
 
+def _ref_id(reference):
+    """Id of a stored reference (DBRef, raw ObjectId or already dereferenced document)"""
+    return getattr(reference, 'id', reference)
+
+def _project_not_found(project_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Project with ID {project_id} not found"
+    )
+
+def _check_project_access(owner_ref, collaborator_refs, current_user: User, action: str, owner_only: bool) -> None:
+    """Raise 403 unless the user owns the project (or collaborates on it when owner_only is False)"""
+    user_has_access = _ref_id(owner_ref) == current_user.id or (
+        not owner_only
+        and current_user.id in [_ref_id(collab) for collab in collaborator_refs or []]
+    )
+    
+    if not user_has_access:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Not authorized to {action} this project"
+        )
+
+_OWNERSHIP_PROJECTION = {'owner_id': 1, 'collaborator_ids': 1}
+
+def _get_project_or_404_fast(project_id: str, current_user: User, action: str = "access", owner_only: bool = False,
+                             projection: Optional[Dict[str, int]] = _OWNERSHIP_PROJECTION) -> Dict[str, Any]:
+    """
+    Load the project once and check the current user may act on it.
+    Owners always have access; collaborators only when owner_only is False.
+    Goes straight to PyMongo, skipping Document construction entirely.
+    
+    Returns:
+        The raw document; only _id, owner_id and collaborator_ids unless projection is None
+    """
+    try:
+        object_id = ObjectId(project_id)
+    except (InvalidId, TypeError):
+        raise _project_not_found(project_id)
+    
+    doc = Project._get_collection().find_one({'_id': object_id}, projection)
+    if doc is None:
+        raise _project_not_found(project_id)
+    
+    _check_project_access(doc.get('owner_id'), doc.get('collaborator_ids'), current_user, action, owner_only)
+    
+    return doc
+
+# The list only needs plan counts and completion, so the plan is read as a status-only skeleton:
+# MongoDB keeps one (possibly empty) element per milestone/task/subtask and drops every other plan field
+_PLAN_STATUS_FIELDS = (
+    'implementation_plan.milestones.status',
+    'implementation_plan.milestones.tasks.status',
+    'implementation_plan.milestones.tasks.subtasks.status',
+)
+
+# Built once at import; each request only builds its own owner/collaborator filter
+_LIST_PROJECTION = {
+    field: 1
+    for field in ('name', 'description', 'status', 'created_at', 'updated_at', 'owner_id', 'collaborator_ids',
+                  *_PLAN_STATUS_FIELDS)
+}
+
+def _project_summary(project: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape one raw list row into its summary, leaving out None values as serialize_mongodb_doc would"""
+    metrics = calculate_plan_metrics((project.get('implementation_plan') or {}).get("milestones", []))
+    owner_ref = project.get('owner_id')
+    # Only include needed fields
+    summary = {
+        'id': str(project['_id']),
+        'name': project.get('name'),
+        'description': project.get('description', ""),
+        'status': project.get('status', "draft"),
+        'created_at': project.get('created_at'),
+        'updated_at': project.get('updated_at'),
+        'owner_id': str(_ref_id(owner_ref)) if owner_ref else None,
+        'collaborator_ids': [str(_ref_id(collab)) for collab in project.get('collaborator_ids') or []],
+        'milestone_count': metrics["milestone_count"],
+        'task_count': metrics["task_count"],
+        'subtask_count': metrics["subtask_count"],
+        'completion_percentage': metrics["completion_percentage"],
+    }
+    return {key: value for key, value in summary.items() if value is not None}
+
 @router.get("/", response_description="List all projects")
 @router.get("")
 async def list_projects(current_user: User = Depends(get_current_user)):
@@ -20,31 +104,16 @@ async def list_projects(current_user: User = Depends(get_current_user)):
     Retrieve all projects for the authenticated user.
     Includes projects where user is either owner or collaborator.
     """
-    # Query projects where user is owner or collaborator
-    projects = Project.objects(Q(owner_id=current_user.id) | Q(collaborator_ids=current_user.id))
-    # Convert projects to dictionaries without nested data
-    result = []
-    for project in projects:
-        metrics = calculate_plan_metrics(project.implementation_plan.get("milestones", []))
-        # Only include needed fields
-        project_dict = {
-            'id': str(project.id),
-            'name': project.name,
-            'description': project.description,
-            'status': project.status,
-            'created_at': project.created_at,
-            'updated_at': project.updated_at,
-            'owner_id': str(project.owner_id.id) if project.owner_id else None,
-            'collaborator_ids': [str(collab_id) for collab_id in project.collaborator_ids] if project.collaborator_ids else [],
-            'milestone_count': metrics["milestone_count"],
-            'task_count': metrics["task_count"],
-            'subtask_count': metrics["subtask_count"],
-            'completion_percentage': metrics["completion_percentage"],
-        }     
-        
-        result.append(project_dict)
-    
-    return serialize_mongodb_doc(result)
+    # Query projects where user is owner or collaborator. Only the listed fields are read (no diagram
+    # SVG/JSON blobs) and rows come back as raw PyMongo dicts, so no Documents or User dereferences are built.
+    # The query goes straight to PyMongo with the precomputed projection, skipping QuerySet construction
+    projects = Project._get_collection().find(
+        {'$or': [{'owner_id': current_user.id}, {'collaborator_ids': current_user.id}]},
+        _LIST_PROJECTION,
+    )
+    # Each raw row is reduced to its summary as the cursor yields it, so only the summaries are kept.
+    # They are already JSON-ready, so orjson encodes them without another serialize_mongodb_doc walk
+    return MongoJSONResponse(content=[_project_summary(project) for project in projects])
     
 
 @router.get("/{project_id}", response_description="Get a complete project with all details")
@@ -62,30 +131,15 @@ async def get_complete_project(project_id: str, current_user: User = Depends(get
             detail=f"Invalid project ID format: {project_id}"
         )
     
-   # Check if project exists and user has access
-    try:
-        project = Project.objects.get(id=project_id)
-    except DoesNotExist:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Project with ID {project_id} not found"
-        )
-    
-    # Check permissions
-    user_has_access = (
-        project.owner_id.id == current_user.id or 
-        (project.collaborator_ids and current_user.id in [collab.id for collab in project.collaborator_ids])
-    )
-    
-    if not user_has_access:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this project"
-        )
+    # Check if project exists and user has access; read-only, so the raw document is enough
+    project = _get_project_or_404_fast(project_id, current_user, projection=None)
     
-    # safely call get_structured_project
+    # safely call get_structured_project, reusing the already authorized document
     try:
-        return await get_structured_project(project_id, current_user)
+        project_dict = await get_structured_project(project_id, project=project)
+        # get_structured_project has already serialized the document, so encode it with orjson
+        # directly instead of walking it a second time
+        return MongoJSONResponse(content=project_dict)
     except Exception as e:
         print(f"Error in get_structured_project: {str(e)}")
         raise HTTPException(
@@ -100,35 +154,44 @@ async def update_project(project_id: str, project_data: dict, current_user: User
     """
     Update all project information.
     """
-    try:
-        project = Project.objects.get(id=project_id)
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Project with ID {project_id} not found"
-        )
+    updates = {
+        key: value for key, value in project_data.items()
+        if key not in ('id', '_id', 'owner_id', 'created_at') and key in Project._fields
+    }
+    updates['updated_at'] = datetime.now(tz=timezone.utc)
     
-    # Check if user has access to update the project
-    if project.owner_id.id != current_user.id:
+    # One find-and-modify both writes the changes and returns the updated document. Ownership is
+    # part of the filter, so only the owner's project can match; field validation save() used to
+    # run is applied to the written values first. As with save(), None clears an optional field
+    modifications = {}
+    try:
+        for key, value in updates.items():
+            field = Project._fields[key]
+            if value is None:
+                if field.required:
+                    raise ValidationError(f"Field is required: {key}", field_name=key)
+                modifications[f"unset__{key}"] = True
+            else:
+                field._validate(value)
+                modifications[f"set__{key}"] = value
+        project = Project.objects(pk=project_id, owner_id=current_user.id).modify(new=True, **modifications)
+    except ValidationError as e:
+        # Invalid id or field value; a missing project or a non-owner still gets its 404 / 403
+        _get_project_or_404_fast(project_id, current_user, action="update", owner_only=True)
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update this project"
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid project data: {e}"
         )
     
-    for key, value in project_data.items():
-        if key in ['id','_id', 'owner_id', 'created_at']:
-            continue
-        if hasattr(project, key):
-            setattr(project, key, value)
-    
-    project.updated_at = datetime.now(tz=timezone.utc)
-
-    project.save()
+    if project is None:
+        # Nothing matched: report whether the project is missing or owned by someone else
+        _get_project_or_404_fast(project_id, current_user, action="update", owner_only=True)
+        raise _project_not_found(project_id)
 
     # Return the updated project
     project_dict = project.to_mongo().to_dict()
     
-    return serialize_mongodb_doc(project_dict)
+    return Response(content=serialize_mongodb_doc_bytes(project_dict), media_type="application/json")
 
 @router.delete("/{project_id}", response_description="Delete a project")
 @router.delete("/{project_id}/", response_description="Delete a project")
@@ -136,23 +199,11 @@ async def delete_project(project_id: str, current_user: User = Depends(get_curre
     """
     Delete a project and all its nested milestones, tasks, and subtasks.
     """
-    try:
-        project = Project.objects.get(id=project_id)
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Project with ID {project_id} not found"
-        )
-    
-    # Check if user has access to delete the project
-    if project.owner_id.id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to delete this project"
-        )
+    # Only the owner may delete the project
+    project = _get_project_or_404_fast(project_id, current_user, action="delete", owner_only=True)
     
     # Delete the project
-    project.delete()
+    Project.objects(pk=project['_id']).delete()
     
     return {"message": "Project deleted successfully"}
 
@@ -49,6 +49,12 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str 
 
     DIAGRAM_TEMPERATURE: float = 0.2
+    # Race fallback LLMs against a slow primary instead of waiting for it to fail. Off by default:
+    # extra paid calls, a cancelled primary is still billed, and a cheaper fallback may win
+    LLM_HEDGE_FALLBACKS: bool = False
+    LLM_HEDGE_DELAY_SECONDS: float = 10.0  # Head start given to the primary before fallbacks join
+    LLM_HEDGE_MAX_FALLBACKS: int = 2  # Fallbacks in flight at once; the rest start as others fail
+    LLM_PROMPT_CACHE_TTL_SECONDS: int = 0  # Reuse successful sequence diagrams for identical requests to the same model; 0 disables the cache
     openai_api_key: str = ""
 
     GEMINI_API_KEY: str
@@ -60,6 +66,8 @@ class Settings(BaseSettings):
     SEQUENCE_DIAGRAM_SITE_URL: str = "https://sequencediagram.org"  
     SELENIUM_TIMEOUT: int = 30 
     MAX_DIAGRAM_ITERATIONS: int = 3  # Maximum number of iterations for diagram generation
+    MAX_SVG_BYTES: int = 2 * 1024 * 1024  # Reject generated SVG data URLs larger than this (2 MB)
+    CHROMEDRIVER_PATH: str = ""  # Preinstalled chromedriver binary for local Chrome; skips webdriver-manager download when set
     
     ENVIRONMENT: str
     ENABLE_MERMAID_CLI_VALIDATION: bool = True
@@ -29,7 +29,12 @@ class User(Document):
     
     meta = {
         'collection': 'users',
-        'indexes': ['email']
+        'indexes': [
+            'email',
+            # Looked up by email verification / password reset links; sparse since most users have none
+            {'fields': ['verification_token'], 'sparse': True},
+            {'fields': ['reset_password_token'], 'sparse': True},
+        ]
     }
     
     @classmethod
@@ -39,7 +39,10 @@ class Project(Document):
     meta = {
         "collection": "projects",
         "indexes": [
-            {"fields": ["owner_id", "name"], "unique": True}
+            {"fields": ["owner_id", "name"], "unique": True},
+            # The project list matches owner_id OR collaborator_ids; both branches need an index
+            # for MongoDB to plan an index union instead of a collection scan
+            "collaborator_ids",
         ]
     }
 
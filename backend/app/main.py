@@ -6,7 +6,8 @@ from app.api.api_router import api_router
 from app.core.config import get_settings
 from app.db.mongodb import connect_to_mongo, close_mongo_connection
 from app.services.ai.sequence_diagram_service import get_global_generator
-from app.utils.mongo_encoder import MongoJSONEncoder
+from app.services.email_service import EmailService
+from app.utils.mongo_encoder import MongoJSONResponse
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 
 settings = get_settings()
@@ -40,6 +41,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Error during diagram generator cleanup: {e}")
     
+    # Close the shared SMTP session
+    try:
+        await EmailService.close_connection()
+        print("✅ SMTP connection closed")
+    except Exception as e:
+        print(f"⚠️ Error closing SMTP connection: {e}")
+    
     # Close MongoDB connection
     close_mongo_connection()
     print("✅ MongoDB connection closed")
@@ -52,6 +60,7 @@ app = FastAPI(
     version="1.0.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     lifespan=lifespan,
+    default_response_class=MongoJSONResponse,
     servers=[
         {"url": "https://astonishing-joy-production.up.railway.app", "description": "Production server"},
         {"url": "http://localhost:8000", "description": "Development server"}
@@ -67,8 +76,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.json_encoders = MongoJSONEncoder
-
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -1,4 +1,5 @@
 import json
+from functools import lru_cache
 from langchain_openai import ChatOpenAI
 from app.core.config import get_settings
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -59,6 +60,23 @@ def create_llm(temperature=0.1, json_mode=True, model='gpt-4o-mini', max_tokens=
         raise ValueError("Failed to create LLM instance")
     
 
+@lru_cache(maxsize=32)
+def get_cached_llm(model='gpt-4o-mini', temperature=0.1, json_mode=True, timeout=60, max_retries=3) -> ChatOpenAI:
+    """
+    Return a shared language model instance for the given configuration.
+    
+    Instances are memoized so hot paths that need the same model on every request
+    don't pay client construction costs each time. Callers must treat the result as read-only.
+    """
+    return create_llm(
+        temperature=temperature,
+        json_mode=json_mode,
+        model=model,
+        timeout=timeout,
+        max_retries=max_retries,
+    )
+
+
 def create_gemini_llm(temperature=0.1, max_tokens=14000, timeout=60, max_retries=3, model=None) -> ChatGoogleGenerativeAI:
     """
     Creates a Google Gemini language model instance with the specified configuration.
@@ -23,6 +23,11 @@ DiagramType = Literal["class", "activity"]
 # Timeout configuration for fallback mechanism
 DIAGRAM_TIMEOUT_SECONDS = 110
 
+# Patterns used when pulling JSON out of LLM responses
+_CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
+_TRAILING_COMMA_OBJECT_RE = re.compile(r',\s*}')
+_TRAILING_COMMA_ARRAY_RE = re.compile(r',\s*]')
+
 # Initialize multiple LLM instances for fallback mechanism
 llm_4o_mini = create_llm(temperature=settings.DIAGRAM_TEMPERATURE, json_mode=True, model="gpt-4o-mini", timeout=DIAGRAM_TIMEOUT_SECONDS, max_retries=2)
 llm_41_mini = create_llm(temperature=settings.DIAGRAM_TEMPERATURE, json_mode=True, model="gpt-4.1-mini", timeout=DIAGRAM_TIMEOUT_SECONDS, max_retries=2)
@@ -247,9 +252,7 @@ def extract_json_from_text(text: str) -> str:
         pass
     
     # Look for JSON within code blocks
-    import re
-    code_block_pattern = r"```(?:json)?\s*([\s\S]*?)```"
-    matches = re.findall(code_block_pattern, text)
+    matches = _CODE_BLOCK_RE.findall(text)
     
     if matches:
         for match in matches:
@@ -289,8 +292,8 @@ def fix_common_json_issues(json_str: str) -> str:
             fixed += char
     
     # Remove trailing commas in arrays and objects
-    fixed = re.sub(r',\s*}', '}', fixed)
-    fixed = re.sub(r',\s*]', ']', fixed)
+    fixed = _TRAILING_COMMA_OBJECT_RE.sub('}', fixed)
+    fixed = _TRAILING_COMMA_ARRAY_RE.sub(']', fixed)
     
     return fixed
 
@@ -396,7 +399,6 @@ def validate_activity_diagram(diagram_data: dict) -> Tuple[bool, str]:
         return False, "nodes must be a list"
     
     # Check each node has required fields
-    node_ids = set()
     for i, node in enumerate(nodes):
         if not isinstance(node, dict):
             return False, f"Node at index {i} is not an object"
@@ -413,17 +415,18 @@ def validate_activity_diagram(diagram_data: dict) -> Tuple[bool, str]:
         valid_types = {"start", "end", "activity", "decision", "merge", "fork", "join"}
         if node.get("type") not in valid_types:
             return False, f"Node at index {i} has invalid type: {node.get('type')}"
-        
-        node_ids.add(node.get("id"))
+    
+    # Lookup tables built once, at their final size, that the checks below resolve against
+    node_ids = {node["id"] for node in nodes}
+    decision_ids = {node["id"] for node in nodes if node["type"] == "decision"}
+    node_types = {node["type"] for node in nodes}
     
     # Check that at least one start node exists
-    start_nodes = [node for node in nodes if node.get("type") == "start"]
-    if not start_nodes:
+    if "start" not in node_types:
         return False, "Activity diagram must have at least one start node"
     
     # Check that at least one end node exists
-    end_nodes = [node for node in nodes if node.get("type") == "end"]
-    if not end_nodes:
+    if "end" not in node_types:
         return False, "Activity diagram must have at least one end node"
     
     # Check flows
@@ -450,8 +453,7 @@ def validate_activity_diagram(diagram_data: dict) -> Tuple[bool, str]:
             return False, f"Flow at index {i} has target '{target}' that is not a defined node"
         
         # Decision nodes should have condition on outgoing flows
-        source_node = next((node for node in nodes if node.get("id") == source and node.get("type") == "decision"), None)
-        if source_node and "condition" not in flow:
+        if source in decision_ids and "condition" not in flow:
             return False, f"Flow at index {i} from decision node '{source}' missing condition"
     
     return True, ""
@@ -1,39 +1,126 @@
 # In services/email_service.py
-import smtplib
+import asyncio
+import logging
+import time
+from html import escape
+from string import Template
+from typing import Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+
+import aiosmtplib
+
 from app.core.config import get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-class EmailService:
-    @staticmethod
-    def send_verification_email(user_email, token):
-        """Send verification email with confirmation link"""
+# Reuse one authenticated SMTP session instead of paying TCP + STARTTLS + AUTH per email
+SMTP_IDLE_CHECK_SECONDS = 60
+
+
+class _SMTPConnection:
+    """Lazily (re)connecting SMTP session shared by all sends on the running event loop."""
+    
+    def __init__(self):
+        self.client: Optional[aiosmtplib.SMTP] = None
+        self.last_used = 0.0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lock: Optional[asyncio.Lock] = None
+    
+    def _bind_to_running_loop(self) -> None:
+        # Clients and locks belong to one event loop; start fresh if we are on a new one
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.lock = asyncio.Lock()
+            self.client = None
+    
+    async def _open(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_SERVER,
+            port=settings.SMTP_PORT,
+            start_tls=True,
+        )
+        await client.connect()
+        await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return client
+    
+    async def _close(self) -> None:
+        client, self.client = self.client, None
+        if client is not None:
+            try:
+                await client.quit()
+            except Exception:
+                pass
+    
+    async def _get_client(self) -> aiosmtplib.SMTP:
+        if self.client is not None and time.monotonic() - self.last_used > SMTP_IDLE_CHECK_SECONDS:
+            # Servers drop idle sessions; probe before reusing an old one
+            try:
+                if (await self.client.noop()).code != 250:
+                    await self._close()
+            except aiosmtplib.SMTPException:
+                await self._close()
         
-        # Create confirmation link
-        confirmation_url = f"{settings.FRONTEND_URL}/auth/verify-email/confirm?token={token}"
+        if self.client is None:
+            self.client = await self._open()
         
-        # Email content
-        subject = "Verify your email address"
-        body = f"""<html>
+        self.last_used = time.monotonic()
+        return self.client
+    
+    async def send(self, to_addr: str, message: MIMEMultipart) -> None:
+        """Send a message, reconnecting once if the server dropped the session."""
+        self._bind_to_running_loop()
+        payload = message.as_string()
+        async with self.lock:
+            try:
+                await (await self._get_client()).sendmail(settings.SMTP_USER, [to_addr], payload)
+            except aiosmtplib.SMTPServerDisconnected:
+                await self._close()
+                await (await self._get_client()).sendmail(settings.SMTP_USER, [to_addr], payload)
+    
+    async def reset(self) -> None:
+        """Close the shared session (used on shutdown and in tests)."""
+        if self.loop is asyncio.get_running_loop():
+            await self._close()
+        self.client = None
+
+
+_smtp_connection = _SMTPConnection()
+
+
+async def _send(to_addr: str, message: MIMEMultipart) -> None:
+    await _smtp_connection.send(to_addr, message)
+
+
+# Map inquiry types to emojis for better visual identification
+INQUIRY_TYPE_EMOJIS = {
+    "feature": "💡",
+    "bug": "🐛",
+    "question": "❓",
+    "other": "💬"
+}
+
+# Email bodies are built once at import; only the placeholders are filled per send
+VERIFICATION_EMAIL_TEMPLATE = Template("""<html>
         <head>
             <style>
-                body {{ font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 0; padding: 0; background: #ffffff; color: #1a1a1a; line-height: 1.6; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 40px 20px; }}
-                .header {{ text-align: center; margin-bottom: 40px; padding-bottom: 24px; border-bottom: 1px solid #e5e5e5; }}
-                .logo {{ font-size: 28px; font-weight: 700; color: #12e88f; margin-bottom: 8px; letter-spacing: -0.5px; }}
-                .title {{ font-size: 18px; font-weight: 500; color: #64748b; }}
-                .content {{ background: #f8fafc; border-radius: 12px; padding: 32px; text-align: center; border: 1px solid #e2e8f0; }}
-                .message {{ font-size: 16px; color: #334155; margin-bottom: 32px; }}
-                .cta-button {{ display: inline-block; background: #12e88f; color: #000000 !important; padding: 16px 32px; text-decoration: none !important; border-radius: 8px; font-weight: 600; font-size: 16px; transition: all 0.2s; }}
-                .cta-button:hover {{ background: #0fd982; color: #000000 !important; }}
-                .cta-button:visited {{ color: #000000 !important; }}
-                .cta-button:active {{ color: #000000 !important; }}
-                .cta-button:link {{ color: #000000 !important; }}
-                a.cta-button {{ color: #000000 !important; text-decoration: none !important; }}
-                .footer {{ text-align: center; margin-top: 32px; font-size: 14px; color: #64748b; }}
-                .expiry {{ font-size: 14px; color: #64748b; margin-top: 16px; }}
+                body { font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 0; padding: 0; background: #ffffff; color: #1a1a1a; line-height: 1.6; }
+                .container { max-width: 600px; margin: 0 auto; padding: 40px 20px; }
+                .header { text-align: center; margin-bottom: 40px; padding-bottom: 24px; border-bottom: 1px solid #e5e5e5; }
+                .logo { font-size: 28px; font-weight: 700; color: #12e88f; margin-bottom: 8px; letter-spacing: -0.5px; }
+                .title { font-size: 18px; font-weight: 500; color: #64748b; }
+                .content { background: #f8fafc; border-radius: 12px; padding: 32px; text-align: center; border: 1px solid #e2e8f0; }
+                .message { font-size: 16px; color: #334155; margin-bottom: 32px; }
+                .cta-button { display: inline-block; background: #12e88f; color: #000000 !important; padding: 16px 32px; text-decoration: none !important; border-radius: 8px; font-weight: 600; font-size: 16px; transition: all 0.2s; }
+                .cta-button:hover { background: #0fd982; color: #000000 !important; }
+                .cta-button:visited { color: #000000 !important; }
+                .cta-button:active { color: #000000 !important; }
+                .cta-button:link { color: #000000 !important; }
+                a.cta-button { color: #000000 !important; text-decoration: none !important; }
+                .footer { text-align: center; margin-top: 32px; font-size: 14px; color: #64748b; }
+                .expiry { font-size: 14px; color: #64748b; margin-top: 16px; }
             </style>
         </head>
         <body>
@@ -49,7 +136,7 @@ class EmailService:
                         One click to activate your account.
                     </div>
                     
-                    <a href="{confirmation_url}" class="cta-button">Verify Email Address</a>
+                    <a href="$confirmation_url" class="cta-button">Verify Email Address</a>
                     
                     <div class="expiry">Link expires in 24 hours</div>
                 </div>
@@ -59,55 +146,28 @@ class EmailService:
                 </div>
             </div>
         </body>
-        </html>"""
-        
-        # Create email message
-        message = MIMEMultipart()
-        message["From"] = settings.SMTP_USER
-        message["To"] = user_email
-        message["Subject"] = subject
-        message.attach(MIMEText(body, "html"))
-        
-        # Send email
-        try:
-            server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT)
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.sendmail(settings.SMTP_USER, user_email, message.as_string())
-            server.quit()
-            return True
-        except Exception as e:
-            print(f"Failed to send email: {str(e)}")
-            return False
+        </html>""")
 
-    @staticmethod
-    def send_password_reset_email(user_email, token):
-        """Send password reset email with reset link"""
-        
-        # Create reset link
-        reset_url = f"{settings.FRONTEND_URL}/auth/reset-password?token={token}"
-        
-        # Email content
-        subject = "Reset your password"
-        body = f"""<html>
+
+PASSWORD_RESET_EMAIL_TEMPLATE = Template("""<html>
         <head>
             <style>
-                body {{ font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 0; padding: 0; background: #ffffff; color: #1a1a1a; line-height: 1.6; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 40px 20px; }}
-                .header {{ text-align: center; margin-bottom: 40px; padding-bottom: 24px; border-bottom: 1px solid #e5e5e5; }}
-                .logo {{ font-size: 28px; font-weight: 700; color: #12e88f; margin-bottom: 8px; letter-spacing: -0.5px; }}
-                .title {{ font-size: 18px; font-weight: 500; color: #64748b; }}
-                .content {{ background: #f8fafc; border-radius: 12px; padding: 32px; text-align: center; border: 1px solid #e2e8f0; }}
-                .message {{ font-size: 16px; color: #334155; margin-bottom: 32px; }}
-                .cta-button {{ display: inline-block; background: #12e88f; color: #000000 !important; padding: 16px 32px; text-decoration: none !important; border-radius: 8px; font-weight: 600; font-size: 16px; transition: all 0.2s; }}
-                .cta-button:hover {{ background: #0fd982; color: #000000 !important; }}
-                .cta-button:visited {{ color: #000000 !important; }}
-                .cta-button:active {{ color: #000000 !important; }}
-                .cta-button:link {{ color: #000000 !important; }}
-                a.cta-button {{ color: #000000 !important; text-decoration: none !important; }}
-                .footer {{ text-align: center; margin-top: 32px; font-size: 14px; color: #64748b; }}
-                .expiry {{ font-size: 14px; color: #64748b; margin-top: 16px; }}
-                .security-notice {{ font-size: 14px; color: #64748b; margin-top: 16px; padding-top: 16px; border-top: 1px solid #e2e8f0; }}
+                body { font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 0; padding: 0; background: #ffffff; color: #1a1a1a; line-height: 1.6; }
+                .container { max-width: 600px; margin: 0 auto; padding: 40px 20px; }
+                .header { text-align: center; margin-bottom: 40px; padding-bottom: 24px; border-bottom: 1px solid #e5e5e5; }
+                .logo { font-size: 28px; font-weight: 700; color: #12e88f; margin-bottom: 8px; letter-spacing: -0.5px; }
+                .title { font-size: 18px; font-weight: 500; color: #64748b; }
+                .content { background: #f8fafc; border-radius: 12px; padding: 32px; text-align: center; border: 1px solid #e2e8f0; }
+                .message { font-size: 16px; color: #334155; margin-bottom: 32px; }
+                .cta-button { display: inline-block; background: #12e88f; color: #000000 !important; padding: 16px 32px; text-decoration: none !important; border-radius: 8px; font-weight: 600; font-size: 16px; transition: all 0.2s; }
+                .cta-button:hover { background: #0fd982; color: #000000 !important; }
+                .cta-button:visited { color: #000000 !important; }
+                .cta-button:active { color: #000000 !important; }
+                .cta-button:link { color: #000000 !important; }
+                a.cta-button { color: #000000 !important; text-decoration: none !important; }
+                .footer { text-align: center; margin-top: 32px; font-size: 14px; color: #64748b; }
+                .expiry { font-size: 14px; color: #64748b; margin-top: 16px; }
+                .security-notice { font-size: 14px; color: #64748b; margin-top: 16px; padding-top: 16px; border-top: 1px solid #e2e8f0; }
             </style>
         </head>
         <body>
@@ -123,7 +183,7 @@ class EmailService:
                         Click the button below to create a new password.
                     </div>
                     
-                    <a href="{reset_url}" class="cta-button">Reset Password</a>
+                    <a href="$reset_url" class="cta-button">Reset Password</a>
                     
                     <div class="expiry">Link expires in 1 hour</div>
                     
@@ -138,63 +198,25 @@ class EmailService:
                 </div>
             </div>
         </body>
-        </html>"""
-        
-        # Create email message
-        message = MIMEMultipart()
-        message["From"] = settings.SMTP_USER
-        message["To"] = user_email
-        message["Subject"] = subject
-        message.attach(MIMEText(body, "html"))
-        
-        # Send email
-        try:
-            server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT)
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.sendmail(settings.SMTP_USER, user_email, message.as_string())
-            server.quit()
-            return True
-        except Exception as e:
-            print(f"Failed to send password reset email: {str(e)}")
-            return False
-        
-    @staticmethod
-    def send_contact_form_email(name: str, email: str, inquiry_type: str, subject: str, message: str):
-        """Send contact form submission email to admin"""
-        
-        settings = get_settings()
-        
-        # Create email subject
-        email_subject = f"[Projectron Contact] {inquiry_type.title()}: {subject}"
-        
-        # Map inquiry types to emojis for better visual identification
-        type_emojis = {
-            "feature": "💡",
-            "bug": "🐛", 
-            "question": "❓",
-            "other": "💬"
-        }
-        
-        emoji = type_emojis.get(inquiry_type.lower(), "📧")
-        
-        # Email content
-        body = f"""<html>
+        </html>""")
+
+
+CONTACT_FORM_EMAIL_TEMPLATE = Template("""<html>
         <head>
             <style>
-                body {{ font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 0; padding: 0; background: #ffffff; color: #1a1a1a; line-height: 1.6; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 40px 20px; }}
-                .header {{ text-align: center; margin-bottom: 40px; padding-bottom: 24px; border-bottom: 1px solid #e5e5e5; }}
-                .logo {{ font-size: 28px; font-weight: 700; color: #12e88f; margin-bottom: 8px; letter-spacing: -0.5px; }}
-                .title {{ font-size: 18px; font-weight: 500; color: #64748b; }}
-                .content {{ background: #f8fafc; border-radius: 12px; padding: 32px; border: 1px solid #e2e8f0; }}
-                .field {{ margin-bottom: 20px; }}
-                .field-label {{ font-weight: 600; color: #374151; margin-bottom: 4px; }}
-                .field-value {{ background: white; padding: 12px; border-radius: 6px; border: 1px solid #d1d5db; }}
-                .message-field {{ margin-top: 24px; }}
-                .message-content {{ background: white; padding: 16px; border-radius: 8px; border: 1px solid #d1d5db; white-space: pre-wrap; }}
-                .footer {{ text-align: center; margin-top: 32px; font-size: 14px; color: #64748b; }}
-                .type-badge {{ display: inline-block; background: #12e88f; color: #000000; padding: 4px 12px; border-radius: 16px; font-size: 12px; font-weight: 600; margin-bottom: 16px; }}
+                body { font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif; margin: 0; padding: 0; background: #ffffff; color: #1a1a1a; line-height: 1.6; }
+                .container { max-width: 600px; margin: 0 auto; padding: 40px 20px; }
+                .header { text-align: center; margin-bottom: 40px; padding-bottom: 24px; border-bottom: 1px solid #e5e5e5; }
+                .logo { font-size: 28px; font-weight: 700; color: #12e88f; margin-bottom: 8px; letter-spacing: -0.5px; }
+                .title { font-size: 18px; font-weight: 500; color: #64748b; }
+                .content { background: #f8fafc; border-radius: 12px; padding: 32px; border: 1px solid #e2e8f0; }
+                .field { margin-bottom: 20px; }
+                .field-label { font-weight: 600; color: #374151; margin-bottom: 4px; }
+                .field-value { background: white; padding: 12px; border-radius: 6px; border: 1px solid #d1d5db; }
+                .message-field { margin-top: 24px; }
+                .message-content { background: white; padding: 16px; border-radius: 8px; border: 1px solid #d1d5db; white-space: pre-wrap; }
+                .footer { text-align: center; margin-top: 32px; font-size: 14px; color: #64748b; }
+                .type-badge { display: inline-block; background: #12e88f; color: #000000; padding: 4px 12px; border-radius: 16px; font-size: 12px; font-weight: 600; margin-bottom: 16px; }
             </style>
         </head>
         <body>
@@ -205,36 +227,116 @@ class EmailService:
                 </div>
                 
                 <div class="content">
-                    <div class="type-badge">{emoji} {inquiry_type.title()}</div>
+                    <div class="type-badge">$emoji $inquiry_type_title</div>
                     
                     <div class="field">
                         <div class="field-label">From:</div>
-                        <div class="field-value">{name} &lt;{email}&gt;</div>
+                        <div class="field-value">$name &lt;$email&gt;</div>
                     </div>
                     
                     <div class="field">
                         <div class="field-label">Subject:</div>
-                        <div class="field-value">{subject}</div>
+                        <div class="field-value">$subject</div>
                     </div>
                     
                     <div class="field">
                         <div class="field-label">Inquiry Type:</div>
-                        <div class="field-value">{inquiry_type.title()}</div>
+                        <div class="field-value">$inquiry_type_title</div>
                     </div>
                     
                     <div class="message-field">
                         <div class="field-label">Message:</div>
-                        <div class="message-content">{message}</div>
+                        <div class="message-content">$message</div>
                     </div>
                 </div>
                 
                 <div class="footer">
                     <p>This message was sent via the Projectron contact form.<br>
-                    Reply directly to this email to respond to {name}.</p>
+                    Reply directly to this email to respond to $name.</p>
                 </div>
             </div>
         </body>
-        </html>"""
+        </html>""")
+
+
+class EmailService:
+    @staticmethod
+    async def close_connection():
+        """Close the shared SMTP session"""
+        await _smtp_connection.reset()
+
+    @staticmethod
+    async def send_verification_email(user_email, token):
+        """Send verification email with confirmation link"""
+        
+        # Create confirmation link
+        confirmation_url = f"{settings.FRONTEND_URL}/auth/verify-email/confirm?token={token}"
+        
+        # Email content
+        subject = "Verify your email address"
+        body = VERIFICATION_EMAIL_TEMPLATE.substitute(confirmation_url=confirmation_url)
+        
+        # Create email message
+        message = MIMEMultipart()
+        message["From"] = settings.SMTP_USER
+        message["To"] = user_email
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "html"))
+        
+        # Send email
+        try:
+            await _send(user_email, message)
+            return True
+        except Exception:
+            logger.exception("Failed to send verification email")
+            return False
+
+    @staticmethod
+    async def send_password_reset_email(user_email, token):
+        """Send password reset email with reset link"""
+        
+        # Create reset link
+        reset_url = f"{settings.FRONTEND_URL}/auth/reset-password?token={token}"
+        
+        # Email content
+        subject = "Reset your password"
+        body = PASSWORD_RESET_EMAIL_TEMPLATE.substitute(reset_url=reset_url)
+        
+        # Create email message
+        message = MIMEMultipart()
+        message["From"] = settings.SMTP_USER
+        message["To"] = user_email
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "html"))
+        
+        # Send email
+        try:
+            await _send(user_email, message)
+            return True
+        except Exception:
+            logger.exception("Failed to send password reset email")
+            return False
+        
+    @staticmethod
+    async def send_contact_form_email(name: str, email: str, inquiry_type: str, subject: str, message: str):
+        """Send contact form submission email to admin"""
+        
+        # Create email subject
+        inquiry_type_title = inquiry_type.title()
+        email_subject = f"[Projectron Contact] {inquiry_type_title}: {subject}"
+        
+        emoji = INQUIRY_TYPE_EMOJIS.get(inquiry_type.lower(), "📧")
+        
+        # Email content
+        # Everything below comes from the public contact form - escape it before it lands in HTML
+        body = CONTACT_FORM_EMAIL_TEMPLATE.substitute(
+            emoji=emoji,
+            inquiry_type_title=escape(inquiry_type_title),
+            name=escape(name),
+            email=escape(email),
+            subject=escape(subject),
+            message=escape(message),
+        )
         
         # Create email message
         email_message = MIMEMultipart()
@@ -246,12 +348,8 @@ class EmailService:
         
         # Send email
         try:
-            server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT)
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.sendmail(settings.SMTP_USER, settings.CONTACT_EMAIL, email_message.as_string())
-            server.quit()
+            await _send(settings.CONTACT_EMAIL, email_message)
             return True
-        except Exception as e:
-            print(f"Failed to send contact form email: {str(e)}")
+        except Exception:
+            logger.exception("Failed to send contact form email")
             return False
\ No newline at end of file
@@ -1,6 +1,9 @@
 from bson import ObjectId
 from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 import json
+import orjson
+from itertools import islice
 from typing import Any, Dict, List
 
 class MongoJSONEncoder(json.JSONEncoder):
@@ -14,25 +17,49 @@ def mongo_jsonable_encoder(obj, **kwargs):
     raw = jsonable_encoder(obj, custom_encoder={ObjectId: str}, **kwargs)
     return raw
 
+# Leaf types that never need conversion
+_JSON_SAFE = frozenset((str, int, float, bool))
+
 def serialize_mongodb_doc(obj: Any) -> Any:
     """
     Recursively serialize MongoDB documents and ObjectIds to JSON-compatible formats.
     Handles nested dictionaries, lists, and special MongoDB types.
     Converts '_id' fields to 'id' fields.
+    Dicts and lists that need no conversion are returned as-is rather than copied.
     """
-    if isinstance(obj, dict):
+    if obj is None or obj.__class__ in _JSON_SAFE:
+        return obj
+    elif isinstance(obj, dict):
         # Handle dictionaries - including those from .to_mongo().to_dict()
-        result = {}
+        # Only start a copy at the first key that changes; the unchanged prefix is copied over then
+        result = None
+        unchanged = 0
         for k, v in obj.items():
-            if v is not None:
-                if k == '_id':
-                    result['id'] = serialize_mongodb_doc(v)
-                else:
-                    result[k] = serialize_mongodb_doc(v)
-        return result
+            if v is None or v.__class__ in _JSON_SAFE:
+                new_v = v
+            else:
+                new_v = serialize_mongodb_doc(v)
+            if result is None:
+                if new_v is v and v is not None and k != '_id':
+                    unchanged += 1
+                    continue
+                result = dict(islice(obj.items(), unchanged))
+            if new_v is not None:
+                result['id' if k == '_id' else k] = new_v
+        return obj if result is None else result
     elif isinstance(obj, list):
         # Handle lists
-        return [serialize_mongodb_doc(item) for item in obj]
+        result = None
+        unchanged = 0
+        for item in obj:
+            new_item = item if item.__class__ in _JSON_SAFE else serialize_mongodb_doc(item)
+            if result is None:
+                if new_item is item:
+                    unchanged += 1
+                    continue
+                result = obj[:unchanged]
+            result.append(new_item)
+        return obj if result is None else result
     elif isinstance(obj, ObjectId):
         # Convert ObjectId to string
         return str(obj)
@@ -41,4 +68,26 @@ def serialize_mongodb_doc(obj: Any) -> Any:
         return serialize_mongodb_doc(obj.to_mongo().to_dict())
     else:
         # Return other types as-is
-        return obj
\ No newline at end of file
+        return obj
+
+def _obj_default(obj: Any) -> Any:
+    """orjson fallback for the BSON / MongoEngine types it can't encode natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if hasattr(obj, 'to_mongo'):
+        return serialize_mongodb_doc(obj.to_mongo().to_dict())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def serialize_mongodb_doc_bytes(obj: Any) -> bytes:
+    """
+    Serialize a MongoDB document straight to JSON bytes.
+    Applies the same rules as serialize_mongodb_doc, then lets orjson encode the tree
+    (datetimes included) so endpoints can return the bytes without FastAPI's jsonable_encoder pass.
+    """
+    return orjson.dumps(serialize_mongodb_doc(obj), default=_obj_default, option=orjson.OPT_NON_STR_KEYS)
+
+class MongoJSONResponse(JSONResponse):
+    """JSON response rendered with orjson that also encodes ObjectIds and MongoEngine documents"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_obj_default, option=orjson.OPT_NON_STR_KEYS)
\ No newline at end of file
@@ -1,14 +1,20 @@
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Union
 from app.db.models.auth import User
 from app.db.models.project import Project
+from bson.dbref import DBRef
 from bson.objectid import ObjectId
 from mongoengine.errors import InvalidQueryError, DoesNotExist
 from app.pydantic_models.project_http_models import PlanGenerationInput
 from app.utils.mongo_encoder import serialize_mongodb_doc
 
 
-async def get_structured_project(project_id: str, current_user=None):
+def _ref_oid(reference):
+    """ObjectId of a stored reference; raw ObjectIds are returned as-is, DBRefs unwrapped"""
+    return reference.id if isinstance(reference, DBRef) else reference
+
+
+async def get_structured_project(project_id: str, current_user=None, project: Optional[Union[Project, Dict[str, Any]]] = None):
     """
     Get a complete structured representation of a project with all its
     nested milestones, tasks, and subtasks.
@@ -16,6 +22,7 @@ async def get_structured_project(project_id: str, current_user=None):
     Args:
         project_id: The string ID of the project to retrieve
         current_user: Optional user for access control checks
+        project: Optional already loaded project (Document or raw PyMongo dict), skips the database lookup
         
     Returns:
         A fully structured JSON-compatible dictionary with all project details
@@ -25,71 +32,76 @@ async def get_structured_project(project_id: str, current_user=None):
         DoesNotExist: If project not found
         PermissionError: If current_user doesn't have access to the project
     """
-    try:
-        # Convert string ID to ObjectId for MongoDB query
-        project = Project.objects(id=project_id).first()
-    except InvalidQueryError:
-        raise ValueError(f"Invalid project ID format: {project_id}")
-    except DoesNotExist:
-        raise DoesNotExist(f"Project with ID {project_id} not found")
+    if project is None:
+        try:
+            # Convert string ID to ObjectId for MongoDB query; raw dict, no Document is built
+            project = Project.objects(id=project_id).as_pymongo().first()
+        except InvalidQueryError:
+            raise ValueError(f"Invalid project ID format: {project_id}")
+        if project is None:
+            raise DoesNotExist(f"Project with ID {project_id} not found")
+    
+    # Build the basic project structure
+    project_dict = project if isinstance(project, dict) else project.to_mongo().to_dict()
     
     # Check access permissions if a user was provided
     if current_user:
-        owner_id_str = str(project.owner_id.id) if hasattr(project.owner_id, 'id') else str(project.owner_id)
-        current_user_id_str = str(current_user.id)
-        collaborator_ids_str = [str(c.id) if hasattr(c, 'id') else str(c) for c in project.collaborator_ids]
+        # Compare ObjectIds directly rather than building and comparing strings
+        current_user_id = ObjectId(current_user.id)
+        is_owner = _ref_oid(project_dict.get('owner_id')) == current_user_id
         
-        if owner_id_str != current_user_id_str and current_user_id_str not in collaborator_ids_str:
+        if not is_owner and not any(_ref_oid(c) == current_user_id for c in project_dict.get('collaborator_ids') or []):
             raise PermissionError("Not authorized to access this project")
     
-
-    
-    # Build the basic project structure
-    project_dict = project.to_mongo().to_dict()
-    project_dict['id'] = str(project.id)
-    if '_id' in project_dict:
-        del project_dict['_id']
+    # Serialize all MongoDB objects to avoid JSON encoding issues. The same single walk renames
+    # '_id' to 'id', and since every stored project has an '_id' it always returns a fresh dict
+    structured = serialize_mongodb_doc(project_dict)
     
-    metrics = calculate_plan_metrics(project_dict.get("implementation_plan", {}).get("milestones", []))
-    project_dict['milestone_count'] = metrics["milestone_count"]
-    project_dict['task_count'] = metrics["task_count"]
-    project_dict['subtask_count'] = metrics["subtask_count"]
-    project_dict['completion_percentage'] = metrics["completion_percentage"]
-    # Serialize all MongoDB objects to avoid JSON encoding issues
-    return serialize_mongodb_doc(project_dict)
+    metrics = calculate_plan_metrics(structured.get("implementation_plan", {}).get("milestones", []))
+    structured['milestone_count'] = metrics["milestone_count"]
+    structured['task_count'] = metrics["task_count"]
+    structured['subtask_count'] = metrics["subtask_count"]
+    structured['completion_percentage'] = metrics["completion_percentage"]
+    return structured
 
 
 async def create_or_update_project_from_plan(project_data:Dict[Any, Any], current_user:User, existing_project_id: str = None):
     """Create a new project or update an existing project from AI-generated plan"""
     try:
         project = None
+        # One timestamp per call, so a new project's created_at and updated_at are identical
+        now = datetime.now(tz=timezone.utc)
         
         if existing_project_id:
-            # This is a refinement of an existing project
-            project = Project.objects(id=ObjectId(existing_project_id)).first()
-            if not project:
+            # This is a refinement of an existing project. The new plan is written with a single
+            # update instead of loading the whole document (diagram SVGs included) and saving it back
+            updates = {
+                "name": project_data.get("name", "Untitled Project"),
+                "high_level_plan": project_data.get("high_level_plan", {}),
+                "technical_architecture": project_data.get("technical_architecture", {}),
+                "api_endpoints": project_data.get("api_endpoints", {}),
+                "data_models": project_data.get("data_models", {}),
+                "ui_components": project_data.get("ui_components", {}),
+                "implementation_plan": project_data.get("implementation_plan", {}),
+                "updated_at": now,
+            }
+            # Project details the plan omits keep their stored values
+            for field in ("description", "tech_stack", "experience_level", "team_size", "status"):
+                if field in project_data:
+                    updates[field] = project_data[field]
+
+            # Field validation normally runs on save(), so apply it before the raw update
+            for field, value in updates.items():
+                Project._fields[field]._validate(value)
+
+            updated = Project.objects(id=ObjectId(existing_project_id)).update_one(
+                **{f"set__{field}": value for field, value in updates.items()}
+            )
+            if not updated:
                 raise Exception(f"Project with ID {existing_project_id} not found")
-              
-            # Update the project with new plan data
-            project.name = project_data.get("name", project_data.get("name", "Untitled Project"))
-            project.description = project_data.get("description", project.description)
-            project.tech_stack = project_data.get("tech_stack", project.tech_stack)
-            project.experience_level = project_data.get("experience_level", project.experience_level)
-            project.team_size = project_data.get("team_size", project.team_size)
-            project.status = project_data.get("status", project.status)
-            
-            # Update with enhanced plan data
-            
-            project.high_level_plan = project_data.get("high_level_plan", {})
-            project.technical_architecture = project_data.get("technical_architecture", {})
-            project.api_endpoints = project_data.get("api_endpoints", {})
-            project.data_models = project_data.get("data_models", {})
-            project.ui_components = project_data.get("ui_components", {})
-            project.implementation_plan = project_data.get("implementation_plan", {})
-            
-            project.updated_at = datetime.now(tz=timezone.utc)
-            project.save()
-            
+
+            return existing_project_id
+
         else:
             # Create a new project
             project = Project(
@@ -107,8 +119,8 @@ async def create_or_update_project_from_plan(project_data:Dict[Any, Any], curren
                 data_models=project_data.get("data_models", {}),
                 ui_components=project_data.get("ui_components", {}),
                 implementation_plan=project_data.get("implementation_plan", {}),
-                created_at=datetime.now(tz=timezone.utc),
-                updated_at=datetime.now(tz=timezone.utc)
+                created_at=now,
+                updated_at=now
             )
             project.save()
         
@@ -172,14 +184,15 @@ def calculate_plan_metrics(milestones):
                 if subtask.get("status") == "completed":
                     completed_items += 1
     
-    # Calculate completion percentage
+    # Calculate completion percentage, rounded half-up to 2 decimals in integer math (hundredths of
+    # a percent) so only the final divide is a float operation and no round() call is needed
     completion_percentage = 0
     if total_items > 0:
-        completion_percentage = (completed_items / total_items) * 100
+        completion_percentage = (completed_items * 20000 + total_items) // (2 * total_items) / 100
     
     return {
         "milestone_count": milestone_count,
         "task_count": task_count,
         "subtask_count": subtask_count,
-        "completion_percentage": round(completion_percentage, 2)
+        "completion_percentage": completion_percentage
     }
\ No newline at end of file
@@ -2,6 +2,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from mongoengine import connect, disconnect
+import mongomock
 import os
 from datetime import datetime, timezone
 
@@ -16,14 +17,13 @@ settings = get_settings()
 
 # Test database setup
 @pytest.fixture(scope="session", autouse=True)
-def setup_test_database():
-    """Set up test database connection"""
+def setup_test_database(mongodb_test_db_name):
+    """Set up an in-memory test database; these tests only need the users collection and its unique email index"""
     # Disconnect any existing connections
     disconnect()
     
-    # Connect to test database
-    test_db_name = "projectron_test"
-    connect(host=f"mongodb://localhost:27017/{test_db_name}")
+    # Connect to mock database
+    connect(mongodb_test_db_name, host='localhost', mongo_client_class=mongomock.MongoClient)
     
     yield
     
@@ -32,12 +32,9 @@ def setup_test_database():
 
 @pytest.fixture(autouse=True)
 def clean_database():
-    """Clean database before each test"""
+    """Clean database before each test, keeping collection indexes"""
     # Clear all users before each test
-    User.drop_collection()
-    yield
-    # Clean up after test
-    User.drop_collection()
+    User._get_collection().delete_many({})
 
 class TestAuthEndpoints:
     """Test class for authentication endpoints"""
@@ -127,8 +124,7 @@ class TestAuthEndpoints:
         
         response = client.post(
             "/api/endpoints/auth/token",
-            data=login_data,  # Form data, not JSON
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
+            data=login_data  # Form data, not JSON
         )
         
         print(f"Login unverified response status: {response.status_code}")
@@ -167,8 +163,7 @@ class TestAuthWithVerifiedUser:
         
         response = client.post(
             "/api/endpoints/auth/token",
-            data=login_data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
+            data=login_data
         )
         
         print(f"Login success response status: {response.status_code}")
@@ -190,8 +185,7 @@ class TestAuthWithVerifiedUser:
         
         response = client.post(
             "/api/endpoints/auth/token",
-            data=login_data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
+            data=login_data
         )
         
         print(f"Wrong password response status: {response.status_code}")
@@ -212,8 +206,7 @@ class TestAuthWithVerifiedUser:
         
         login_response = client.post(
             "/api/endpoints/auth/token",
-            data=login_data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
+            data=login_data
         )
         
         assert login_response.status_code == 200
@@ -1,47 +1,67 @@
 # tests/integration/test_auth_flow.py
+import hashlib
+import secrets
 import pytest
+from fastapi import HTTPException, Response
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timezone, timedelta
+from mongoengine import connect, disconnect
+import mongomock
 
-from app.main import app
+from app.api.deps import get_current_user
+from app.api.endpoints.auth import verify_email
 from app.db.models.auth import User
-from app.core.config import get_settings
-
-settings = get_settings()
 
 # Test configuration
 TEST_USER_EMAIL = "testuser@example.com"
 TEST_USER_PASSWORD = "testpassword123"
 TEST_USER_FULL_NAME = "Test User"
+TEST_USER_PASSWORD_HASH = hashlib.sha256(TEST_USER_PASSWORD.encode()).hexdigest()
 
-# tests/integration/test_auth_flow.py
-import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
-from datetime import datetime, timezone, timedelta
-from mongoengine import connect, disconnect
-import mongomock
-
-from app.main import app
-from app.db.models.auth import User
-from app.core.config import get_settings
+def make_user(verified=False, token_expires_in=timedelta(hours=24)):
+    """
+    Insert the test user directly, as /register would leave it. Unverified users get a
+    verification token expiring after token_expires_in (negative for an expired token).
+    """
+    user = User(
+        email=TEST_USER_EMAIL,
+        hashed_password=TEST_USER_PASSWORD_HASH,
+        full_name=TEST_USER_FULL_NAME,
+        roles=["user"],
+        is_email_verified=verified
+    )
+    if not verified:
+        user.verification_token = secrets.token_urlsafe(32)
+        user.verification_token_expires = datetime.now(tz=timezone.utc) + token_expires_in
+    return user.save()
 
-settings = get_settings()
+def login(client, email=TEST_USER_EMAIL, password=TEST_USER_PASSWORD):
+    """Log in through the OAuth2 form endpoint (FastAPI OAuth2 uses the 'username' field)"""
+    return client.post(
+        "/api/endpoints/auth/token",
+        data={"username": email, "password": password}
+    )
 
-# Test configuration
-TEST_USER_EMAIL = "testuser@example.com"
-TEST_USER_PASSWORD = "testpassword123"
-TEST_USER_FULL_NAME = "Test User"
+@pytest.fixture(scope="session")
+def _shared_client():
+    """
+    Create one test client shared by the whole run. app.main wires every router
+    (including the LangChain-backed plan endpoints), so it is only imported once a
+    test actually needs the client.
+    """
+    from app.main import app
+    return TestClient(app)
 
 @pytest.fixture
-def client():
-    """Create test client"""
-    return TestClient(app)
+def client(_shared_client):
+    """Hand out the shared test client without auth cookies from earlier tests"""
+    _shared_client.cookies.clear()
+    return _shared_client
 
-@pytest.fixture(autouse=True)
+@pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
-    """Set up test database connection"""
+    """Set up test database connection once for the whole run"""
     # Disconnect any existing connections
     disconnect()
     
@@ -54,89 +74,106 @@ def setup_test_db():
     
     yield
     
-    # Clean up after each test
-    User.objects.delete()
     disconnect()
 
+@pytest.fixture(autouse=True)
+def clean_database(request):
+    """Remove users created by each test, unless it is marked no_db"""
+    yield
+    if request.node.get_closest_marker("no_db") is None:
+        User.objects.delete()
+
+@pytest.fixture(scope="module")
+def _email_patch():
+    """Patch the verification email sender once for this module"""
+    with patch(
+        'app.services.email_service.EmailService.send_verification_email',
+        return_value=True
+    ) as mock_send:
+        yield mock_send
+
 @pytest.fixture
-def mock_email_service():
+def mock_email_service(_email_patch):
     """Mock email service to avoid sending real emails"""
-    with patch('app.services.email_service.EmailService.send_verification_email') as mock_send:
-        mock_send.return_value = True
-        yield mock_send
+    _email_patch.reset_mock()
+    return _email_patch
 
-class TestAuthFlowIntegration:
-    """Integration tests for complete authentication flow"""
+@pytest.mark.no_db
+class TestAuthHappyPath:
+    """
+    Integration tests for the successful authentication flow, one step per test:
+    register, verify email, login, access protected resources, logout.
+    Each step's fixture builds on the previous one and runs once for the class.
+    """
     
-    def test_complete_auth_flow_success(self, client, mock_email_service):
-        """
-        Test complete successful authentication flow:
-        1. Register user
-        2. Verify email
-        3. Login
-        4. Access protected resource
-        5. Logout
-        """
-        # Step 1: Register new user
+    @pytest.fixture(scope="class")
+    def registration(self, _shared_client, _email_patch):
+        """Register the test user; yields the response and the user as stored right after"""
+        _email_patch.reset_mock()
         register_data = {
             "email": TEST_USER_EMAIL,
             "password": TEST_USER_PASSWORD,
             "full_name": TEST_USER_FULL_NAME
         }
         
-        register_response = client.post("/api/endpoints/auth/register", json=register_data)
+        response = _shared_client.post("/api/endpoints/auth/register", json=register_data)
+        
+        yield response, User.objects(email=TEST_USER_EMAIL).first()
         
-        assert register_response.status_code == 201
-        register_result = register_response.json()
+        User.objects.delete()
+    
+    @pytest.fixture(scope="class")
+    def verify_response(self, _shared_client, registration):
+        """Verify the registered user's email with the issued token"""
+        _, user = registration
+        return _shared_client.get(f"/api/endpoints/auth/verify-email?token={user.verification_token}")
+    
+    @pytest.fixture(scope="class")
+    def login_response(self, _shared_client, verify_response):
+        """Log in once the email is verified"""
+        return login(_shared_client)
+    
+    @pytest.fixture(scope="class")
+    def auth_headers(self, login_response):
+        """Bearer headers for the logged-in user"""
+        return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    
+    def test_register(self, registration, _email_patch):
+        """Test registration creates an unverified user and sends the verification email"""
+        response, user = registration
+        
+        assert response.status_code == 201
+        register_result = response.json()
         assert register_result["email"] == TEST_USER_EMAIL
         assert register_result["full_name"] == TEST_USER_FULL_NAME
         assert "id" in register_result
         
-        # Verify email service was called
-        mock_email_service.assert_called_once()
+        _email_patch.assert_called_once()
         
-        # Step 2: Verify user exists in database but not verified
-        user = User.objects(email=TEST_USER_EMAIL).first()
         assert user is not None
-        assert user.email == TEST_USER_EMAIL
         assert user.is_email_verified == False
         assert user.verification_token is not None
-        
-        # Step 3: Verify email with token
-        verification_token = user.verification_token
-        verify_response = client.get(f"/api/endpoints/auth/verify-email?token={verification_token}")
+    
+    def test_verify_email(self, registration, verify_response):
+        """Test the verification token verifies the user and is consumed"""
+        _, user = registration
         
         assert verify_response.status_code == 200
-        verify_result = verify_response.json()
-        assert verify_result["message"] == "Email successfully verified"
+        assert verify_response.json()["message"] == "Email successfully verified"
         
-        # Check user is now verified
-        user.reload()
+        user = User.objects(id=user.id).only('is_email_verified', 'verification_token').first()
         assert user.is_email_verified == True
         assert user.verification_token is None
-        
-        # Step 4: Login with correct credentials
-        login_data = {
-            "username": TEST_USER_EMAIL,  # FastAPI OAuth2 uses 'username' field
-            "password": TEST_USER_PASSWORD
-        }
-        
-        login_response = client.post(
-            "/api/endpoints/auth/token",
-            data=login_data,  # Form data, not JSON
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
-        
+    
+    def test_login(self, login_response):
+        """Test a verified user can log in"""
         assert login_response.status_code == 200
         login_result = login_response.json()
         assert "access_token" in login_result
         assert login_result["token_type"] == "bearer"
-        
-        # Extract token for subsequent requests
-        access_token = login_result["access_token"]
-        auth_headers = {"Authorization": f"Bearer {access_token}"}
-        
-        # Step 5: Access protected resource (get current user)
+    
+    def test_get_current_user(self, client, auth_headers):
+        """Test the token gives access to the current user"""
         me_response = client.get("/api/endpoints/auth/me", headers=auth_headers)
         
         assert me_response.status_code == 200
@@ -144,29 +181,28 @@ class TestAuthFlowIntegration:
         assert me_result["email"] == TEST_USER_EMAIL
         assert me_result["full_name"] == TEST_USER_FULL_NAME
         assert "id" in me_result
-        
-        # Step 6: Access another protected resource (projects list)
+    
+    def test_list_projects(self, client, auth_headers):
+        """Test the token gives access to the (empty) projects list"""
         projects_response = client.get("/api/endpoints/projects/", headers=auth_headers)
         
         assert projects_response.status_code == 200
-        projects_result = projects_response.json()
-        assert isinstance(projects_result, list)  # Should return empty list for new user
-        
-        # Step 7: Logout
+        assert isinstance(projects_response.json(), list)
+    
+    def test_logout(self, client, auth_headers):
+        """Test the logged-in user can log out"""
         logout_response = client.post("/api/endpoints/auth/logout", headers=auth_headers)
         
         assert logout_response.status_code == 200
-        logout_result = logout_response.json()
-        assert logout_result["message"] == "Successfully logged out"
+        assert logout_response.json()["message"] == "Successfully logged out"
+
+class TestAuthFlowIntegration:
+    """Integration tests for authentication failure paths"""
     
     def test_registration_with_existing_email(self, client, mock_email_service):
         """Test registration fails when email already exists"""
         # Create user first
-        User.create_user(
-            email=TEST_USER_EMAIL,
-            password=TEST_USER_PASSWORD,
-            full_name=TEST_USER_FULL_NAME
-        )
+        make_user()
         
         # Try to register with same email
         register_data = {
@@ -181,123 +217,62 @@ class TestAuthFlowIntegration:
         error_result = register_response.json()
         assert "Email already registered" in error_result["detail"]
     
-    def test_login_with_unverified_email(self, client, mock_email_service):
+    def test_login_with_unverified_email(self, client):
         """Test login fails for unverified email"""
-        # Register user but don't verify email
-        register_data = {
-            "email": TEST_USER_EMAIL,
-            "password": TEST_USER_PASSWORD,
-            "full_name": TEST_USER_FULL_NAME
-        }
-        
-        client.post("/api/endpoints/auth/register", json=register_data)
+        # Create user but don't verify email
+        make_user()
         
         # Try to login without verifying email
-        login_data = {
-            "username": TEST_USER_EMAIL,
-            "password": TEST_USER_PASSWORD
-        }
-        
-        login_response = client.post(
-            "/api/endpoints/auth/token",
-            data=login_data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
+        login_response = login(client)
         
         assert login_response.status_code == 403
         error_result = login_response.json()
         assert "Email not verified" in error_result["detail"]
     
-    def test_login_with_wrong_credentials(self, client, mock_email_service):
-        """Test login fails with incorrect credentials"""
+    @pytest.mark.parametrize("email,password", [
+        (TEST_USER_EMAIL, "wrong_password"),
+        ("wrong@example.com", TEST_USER_PASSWORD),
+    ])
+    def test_login_with_wrong_credentials(self, client, email, password):
+        """Test login fails with incorrect email or password"""
         # Create and verify user
-        user = User.create_user(
-            email=TEST_USER_EMAIL,
-            password=TEST_USER_PASSWORD,
-            full_name=TEST_USER_FULL_NAME
-        )
-        user.is_email_verified = True
-        user.save()
-        
-        # Try login with wrong password
-        login_data = {
-            "username": TEST_USER_EMAIL,
-            "password": "wrong_password"
-        }
-        
-        login_response = client.post(
-            "/api/endpoints/auth/token",
-            data=login_data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
-        
-        assert login_response.status_code == 401
-        error_result = login_response.json()
-        assert "Incorrect email or password" in error_result["detail"]
-        
-        # Try login with wrong email
-        login_data = {
-            "username": "wrong@example.com",
-            "password": TEST_USER_PASSWORD
-        }
+        make_user(verified=True)
         
-        login_response = client.post(
-            "/api/endpoints/auth/token",
-            data=login_data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
+        login_response = login(client, email=email, password=password)
         
         assert login_response.status_code == 401
         error_result = login_response.json()
         assert "Incorrect email or password" in error_result["detail"]
     
-    def test_access_protected_resource_without_auth(self, client):
-        """Test accessing protected resource without authentication fails"""
-        # Try to access protected resource without token
-        me_response = client.get("/api/endpoints/auth/me")
-        
-        assert me_response.status_code == 401
-        
-        projects_response = client.get("/api/endpoints/projects/")
+    @pytest.mark.no_db
+    @pytest.mark.parametrize("path", ["/api/endpoints/auth/me", "/api/endpoints/projects/"])
+    def test_access_protected_resource_without_auth(self, client, path):
+        """Test accessing protected resources without a token fails"""
+        response = client.get(path)
         
-        assert projects_response.status_code == 401
+        assert response.status_code == 401
     
-    def test_access_protected_resource_with_invalid_token(self, client):
-        """Test accessing protected resource with invalid token fails"""
-        # Use invalid token
-        invalid_headers = {"Authorization": "Bearer invalid_token_here"}
-        
-        me_response = client.get("/api/endpoints/auth/me", headers=invalid_headers)
-        
-        assert me_response.status_code == 401
-        
-        projects_response = client.get("/api/endpoints/projects/", headers=invalid_headers)
+    @pytest.mark.no_db
+    async def test_access_protected_resource_with_invalid_token(self):
+        """Test the auth dependency rejects an invalid token (called directly, no HTTP round-trip)"""
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user(request=MagicMock(), token="invalid_token_here")
         
-        assert projects_response.status_code == 401
+        assert exc_info.value.status_code == 401
     
-    def test_email_verification_with_invalid_token(self, client):
-        """Test email verification fails with invalid token"""
-        verify_response = client.get("/api/endpoints/auth/verify-email?token=invalid_token")
-        
-        assert verify_response.status_code == 400
-        error_result = verify_response.json()
-        assert "Invalid verification token" in error_result["detail"]
+    @pytest.mark.no_db
+    def test_email_verification_with_invalid_token(self):
+        """Test email verification fails with invalid token (handler called directly)"""
+        with pytest.raises(HTTPException) as exc_info:
+            verify_email(Response(), token="invalid_token")
+        
+        assert exc_info.value.status_code == 400
+        assert "Invalid verification token" in exc_info.value.detail
     
-    def test_email_verification_with_expired_token(self, client, mock_email_service):
+    def test_email_verification_with_expired_token(self, client):
         """Test email verification fails with expired token"""
-        # Register user
-        register_data = {
-            "email": TEST_USER_EMAIL,
-            "password": TEST_USER_PASSWORD,
-            "full_name": TEST_USER_FULL_NAME
-        }
-        
-        client.post("/api/endpoints/auth/register", json=register_data)
-        
-        # Get user and manually expire the token
-        user = User.objects(email=TEST_USER_EMAIL).first()
-        user.verification_token_expires = datetime.now(tz=timezone.utc) - timedelta(hours=1)  # Expired 1 hour ago
-        user.save()
+        # Create user whose token expired 1 hour ago
+        user = make_user(token_expires_in=timedelta(hours=-1))
         
         # Try to verify with expired token
         verification_token = user.verification_token
@@ -309,17 +284,8 @@ class TestAuthFlowIntegration:
     
     def test_resend_verification_email(self, client, mock_email_service):
         """Test resending verification email"""
-        # Register user
-        register_data = {
-            "email": TEST_USER_EMAIL,
-            "password": TEST_USER_PASSWORD,
-            "full_name": TEST_USER_FULL_NAME
-        }
-        
-        client.post("/api/endpoints/auth/register", json=register_data)
-        
-        # Reset mock to count new calls
-        mock_email_service.reset_mock()
+        # Create user but don't verify email
+        make_user()
         
         # Resend verification
         resend_data = {"email": TEST_USER_EMAIL}
@@ -335,13 +301,7 @@ class TestAuthFlowIntegration:
     def test_resend_verification_for_verified_user(self, client, mock_email_service):
         """Test resending verification email for already verified user"""
         # Create and verify user
-        user = User.create_user(
-            email=TEST_USER_EMAIL,
-            password=TEST_USER_PASSWORD,
-            full_name=TEST_USER_FULL_NAME
-        )
-        user.is_email_verified = True
-        user.save()
+        make_user(verified=True)
         
         # Try to resend verification
         resend_data = {"email": TEST_USER_EMAIL}
@@ -1,34 +1,117 @@
 # tests/test_diagrams.py
+import asyncio
+import httpx
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
 from mongoengine import connect, disconnect
 from datetime import datetime, timezone
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 import json
+import orjson
+import bson
+from bson import ObjectId
+import threading
 
 # Import your main app and models
 from app.main import app
 from app.db.models.auth import User
 from app.db.models.project import Project
 from app.core.config import get_settings
+from app.core.jwt import create_access_token
 from app.api.endpoints import diagrams  # Import the diagrams module for endpoint-level mocking
 
-# Create test client
-client = TestClient(app)
 settings = get_settings()
 
+# Sample SVG content for mocking diagram generation
+MOCK_SVG_CONTENT = '''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<svg width="400" height="300" xmlns="http://www.w3.org/2000/svg">
+  <rect x="10" y="10" width="100" height="50" fill="lightblue" stroke="black"/>
+  <text x="60" y="40" text-anchor="middle">Test Diagram</text>
+  <rect x="150" y="10" width="100" height="50" fill="lightgreen" stroke="black"/>
+  <text x="200" y="40" text-anchor="middle">Component</text>
+  <line x1="110" y1="35" x2="150" y2="35" stroke="black" marker-end="url(#arrowhead)"/>
+</svg>'''
+
+# Stored form of the sample project (field defaults filled in), built once for the module and
+# cached as BSON; decoding it gives each test its own deep copy, about 5x faster than deepcopy
+PROJECT_TEMPLATE_BSON = bson.encode(Project(
+    name="Test Project",
+    description="A test project for diagram generation",
+    tech_stack=["Python", "FastAPI", "React", "MongoDB"],
+    experience_level="mid",
+    team_size=3,
+    status="draft",
+    technical_architecture={
+        "system_components": [
+            {
+                "name": "User Service",
+                "type": "backend",
+                "description": "Handles user authentication and management",
+                "technologies": ["FastAPI", "MongoDB"],
+                "responsibilities": ["User registration", "Authentication"]
+            },
+            {
+                "name": "Task Service", 
+                "type": "backend",
+                "description": "Manages task operations",
+                "technologies": ["FastAPI", "MongoDB"],
+                "responsibilities": ["Task CRUD", "Task assignment"]
+            },
+            {
+                "name": "Frontend",
+                "type": "frontend", 
+                "description": "User interface",
+                "technologies": ["React", "TypeScript"],
+                "responsibilities": ["User interaction", "Data display"]
+            }
+        ]
+    },
+    data_models={
+        "entities": [
+            {
+                "name": "User",
+                "description": "User entity",
+                "properties": [
+                    {"name": "id", "type": "ObjectId", "description": "Unique identifier", "required": True},
+                    {"name": "email", "type": "String", "description": "User email", "required": True},
+                    {"name": "name", "type": "String", "description": "User name", "required": True}
+                ]
+            },
+            {
+                "name": "Task",
+                "description": "Task entity", 
+                "properties": [
+                    {"name": "id", "type": "ObjectId", "description": "Unique identifier", "required": True},
+                    {"name": "title", "type": "String", "description": "Task title", "required": True},
+                    {"name": "completed", "type": "Boolean", "description": "Task status", "required": False}
+                ]
+            }
+        ],
+        "relationships": [
+            {
+                "source_entity": "User",
+                "target_entity": "Task", 
+                "type": "association",  # Fix: use valid type instead of "one-to-many"
+                "description": "User can have multiple tasks"
+            }
+        ]
+    }
+).to_mongo())
+
 # Test database setup
 @pytest.fixture(scope="session", autouse=True)
-def setup_test_database():
+def setup_test_database(mongodb_test_uri, mongodb_test_db_name):
     """Set up test database connection"""
     # Disconnect any existing connections
     disconnect()
     
     # Connect to test database
-    test_db_name = "projectron_test"
+    # One bounded pool for the whole module; the async client's requests all share it
     connect(
-        host=f"mongodb://localhost:27017/{test_db_name}",
-        uuidRepresentation='standard'
+        host=f"{mongodb_test_uri}/{mongodb_test_db_name}",
+        uuidRepresentation='standard',
+        maxPoolSize=10,
+        minPoolSize=2
     )
     
     yield
@@ -37,19 +120,16 @@ def setup_test_database():
     disconnect()
 
 @pytest.fixture(autouse=True)
-def clean_database():
-    """Clean database before each test"""
-    # Clear all collections before each test
-    User.drop_collection()
-    Project.drop_collection()
-    yield
-    # Clean up after test
-    User.drop_collection()
-    Project.drop_collection()
+def clean_database(verified_user):
+    """Empty the collections before each test, keeping their indexes and the shared user"""
+    User._get_collection().delete_many({"_id": {"$ne": verified_user.id}})
+    Project._get_collection().delete_many({})
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def verified_user():
-    """Create a verified user for testing"""
+    """Create a verified user shared by the module's tests"""
+    # Clear leftovers from an earlier run so the unique email is free
+    User._get_collection().delete_many({})
     user = User.create_user(
         email="testuser@example.com",
         password="testpassword123",
@@ -58,26 +138,33 @@ def verified_user():
     # Manually verify the user (skip email verification for testing)
     user.is_email_verified = True
     user.save()
-    return user
+    yield user
+    # Drop what the module's last test left behind
+    User.drop_collection()
+    Project.drop_collection()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
+def event_loop():
+    """One event loop for the whole module, so the shared async client outlives single tests"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest_asyncio.fixture(scope="module")
+async def aclient():
+    """Async test client talking to the app in-process, shared by the module's tests"""
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://test"
+    ) as client:
+        yield client
+
+@pytest.fixture(scope="module")
 def authenticated_user_token(verified_user):
-    """Get authentication token for verified user"""
-    login_data = {
-        "username": verified_user.email,
-        "password": "testpassword123"
-    }
-    
-    response = client.post(
-        "/api/endpoints/auth/token",
-        data=login_data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"}
-    )
-    
-    assert response.status_code == 200
-    return response.json()["access_token"]
+    """Mint an access token for the verified user, once per module, without going through login"""
+    return create_access_token(data={"sub": str(verified_user.id)})
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def auth_headers(authenticated_user_token):
     """Create authorization headers for API requests"""
     return {"Authorization": f"Bearer {authenticated_user_token}"}
@@ -85,152 +172,91 @@ def auth_headers(authenticated_user_token):
 @pytest.fixture
 def sample_project_with_architecture(verified_user):
     """Create a sample project with technical architecture for diagram generation"""
-    project = Project(
-        name="Test Project",
-        description="A test project for diagram generation",
-        tech_stack=["Python", "FastAPI", "React", "MongoDB"],
-        experience_level="mid",
-        team_size=3,
-        status="draft",
-        owner_id=verified_user,
-        technical_architecture={
-            "system_components": [
-                {
-                    "name": "User Service",
-                    "type": "backend",
-                    "description": "Handles user authentication and management",
-                    "technologies": ["FastAPI", "MongoDB"],
-                    "responsibilities": ["User registration", "Authentication"]
-                },
-                {
-                    "name": "Task Service", 
-                    "type": "backend",
-                    "description": "Manages task operations",
-                    "technologies": ["FastAPI", "MongoDB"],
-                    "responsibilities": ["Task CRUD", "Task assignment"]
-                },
-                {
-                    "name": "Frontend",
-                    "type": "frontend", 
-                    "description": "User interface",
-                    "technologies": ["React", "TypeScript"],
-                    "responsibilities": ["User interaction", "Data display"]
-                }
-            ]
-        },
-        data_models={
-            "entities": [
-                {
-                    "name": "User",
-                    "description": "User entity",
-                    "properties": [
-                        {"name": "id", "type": "ObjectId", "description": "Unique identifier", "required": True},
-                        {"name": "email", "type": "String", "description": "User email", "required": True},
-                        {"name": "name", "type": "String", "description": "User name", "required": True}
-                    ]
-                },
-                {
-                    "name": "Task",
-                    "description": "Task entity", 
-                    "properties": [
-                        {"name": "id", "type": "ObjectId", "description": "Unique identifier", "required": True},
-                        {"name": "title", "type": "String", "description": "Task title", "required": True},
-                        {"name": "completed", "type": "Boolean", "description": "Task status", "required": False}
-                    ]
-                }
-            ],
-            "relationships": [
-                {
-                    "source_entity": "User",
-                    "target_entity": "Task", 
-                    "type": "association",  # Fix: use valid type instead of "one-to-many"
-                    "description": "User can have multiple tasks"
-                }
-            ]
-        }
-    )
-    project.save()
-    return project
+    doc = bson.decode(PROJECT_TEMPLATE_BSON)
+    doc["_id"] = ObjectId()
+    doc["owner_id"] = verified_user.id
+    Project._get_collection().insert_one(doc)
+    return Project._from_son(doc)
 
 @pytest.fixture
-def mock_svg_content():
-    """Sample SVG content for mocking diagram generation"""
-    return '''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
-<svg width="400" height="300" xmlns="http://www.w3.org/2000/svg">
-  <rect x="10" y="10" width="100" height="50" fill="lightblue" stroke="black"/>
-  <text x="60" y="40" text-anchor="middle">Test Diagram</text>
-  <rect x="150" y="10" width="100" height="50" fill="lightgreen" stroke="black"/>
-  <text x="200" y="40" text-anchor="middle">Component</text>
-  <line x1="110" y1="35" x2="150" y2="35" stroke="black" marker-end="url(#arrowhead)"/>
-</svg>'''
+def project_id(sample_project_with_architecture):
+    """String id of the sample project, as the endpoints take it"""
+    return str(sample_project_with_architecture.id)
+
+def assert_svg_response(response):
+    """Assert a diagram endpoint answered 200 with an SVG document"""
+    assert response.status_code == 200
+    assert "image/svg+xml" in response.headers.get("content-type", "")
+    assert b"<svg" in response.content
+
+def assert_stored(project_id, **expected):
+    """Assert the stored project holds the expected value for each given field"""
+    # Fetch only the fields under test, skipping the architecture/data-model payload and hydration
+    stored = Project._get_collection().find_one(
+        {"_id": ObjectId(project_id)},
+        {field: 1 for field in expected}
+    )
+    for field, value in expected.items():
+        assert stored[field] == value, field
 
 class TestSequenceDiagrams:
     """Test class for sequence diagram endpoints"""
     
-    def test_create_sequence_diagram_success(self, auth_headers, sample_project_with_architecture, mock_svg_content):
+    @pytest.mark.asyncio
+    async def test_create_sequence_diagram_success(self, aclient, monkeypatch, auth_headers, project_id):
         """Test successful sequence diagram creation"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Mock the sequence diagram generation service
         mock_result = {
             "success": True,
-            "svg": mock_svg_content,
+            "svg": MOCK_SVG_CONTENT,
             "diagram_source": "participant User\nparticipant System\nUser->System: login"
         }
         
         # Mock at the endpoint level where the function is imported and used
-        with patch('app.api.endpoints.diagrams.generate_sequence_diagram', return_value=mock_result) as mock_generator:
-            response = client.post(
-                "/api/endpoints/diagrams/sequence/create",
-                headers=auth_headers,
-                json={"project_id": project_id}
-            )
-            
-            print(f"Create sequence response status: {response.status_code}")
-            print(f"Create sequence response content type: {response.headers.get('content-type')}")
-            print(f"Create sequence response length: {len(response.content)}")
-            
-            assert response.status_code == 200
-            # Fix: Accept either content type format
-            content_type = response.headers.get("content-type", "")
-            assert "image/svg+xml" in content_type
-            assert b"<svg" in response.content
-            assert b"Test Diagram" in response.content
-            
-            # Verify the AI service was called
-            mock_generator.assert_called_once()
-            
-            # Verify project was updated with diagram data
-            updated_project = Project.objects.get(id=project_id)
-            assert updated_project.sequence_diagram_svg == mock_svg_content
-            assert updated_project.sequence_diagram_source_code == "participant User\nparticipant System\nUser->System: login"
+        mock_generator = AsyncMock(return_value=mock_result)
+        monkeypatch.setattr(diagrams, "generate_sequence_diagram", mock_generator)
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/sequence/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        assert_svg_response(response)
+        assert b"Test Diagram" in response.content
+        
+        # Verify the AI service was called
+        mock_generator.assert_called_once()
+        
+        # Verify project was updated with diagram data
+        assert_stored(
+            project_id,
+            sequence_diagram_svg=MOCK_SVG_CONTENT,
+            sequence_diagram_source_code="participant User\nparticipant System\nUser->System: login"
+        )
     
-    def test_create_sequence_diagram_ai_failure(self, auth_headers, sample_project_with_architecture):
+    @pytest.mark.asyncio
+    async def test_create_sequence_diagram_ai_failure(self, aclient, monkeypatch, auth_headers, project_id):
         """Test sequence diagram creation when AI service fails"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Mock AI service failure
         mock_result = {
             "success": False,
             "error": "AI service timeout"
         }
         
-        with patch('app.api.endpoints.diagrams.generate_sequence_diagram', return_value=mock_result):
-            response = client.post(
-                "/api/endpoints/diagrams/sequence/create",
-                headers=auth_headers,
-                json={"project_id": project_id}
-            )
-            
-            print(f"Failed sequence response status: {response.status_code}")
-            print(f"Failed sequence response body: {response.text}")
-            
-            assert response.status_code == 504
+        monkeypatch.setattr(diagrams, "generate_sequence_diagram", AsyncMock(return_value=mock_result))
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/sequence/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        assert response.status_code == 504
     
-    def test_update_sequence_diagram_success(self, auth_headers, sample_project_with_architecture, mock_svg_content):
+    @pytest.mark.asyncio
+    async def test_update_sequence_diagram_success(self, aclient, monkeypatch, auth_headers, sample_project_with_architecture, project_id):
         """Test successful sequence diagram update"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # First, set some existing diagram data
         project = sample_project_with_architecture
         project.sequence_diagram_source_code = "old diagram source"
@@ -240,72 +266,61 @@ class TestSequenceDiagrams:
         # Mock the update result
         mock_result = {
             "success": True,
-            "svg": mock_svg_content,
+            "svg": MOCK_SVG_CONTENT,
             "diagram_source": "participant User\nparticipant NewSystem\nUser->NewSystem: updated_action"
         }
         
         # Mock at the endpoint level
-        with patch('app.api.endpoints.diagrams.generate_sequence_diagram', return_value=mock_result):
-            response = client.put(
-                "/api/endpoints/diagrams/sequence/update",
-                headers=auth_headers,
-                json={
-                    "project_id": project_id,
-                    "change_request": "Add new system component"
-                }
-            )
-            
-            print(f"Update sequence response status: {response.status_code}")
-            print(f"Update sequence response content type: {response.headers.get('content-type')}")
-            
-            assert response.status_code == 200
-            # Fix: Accept either content type format
-            content_type = response.headers.get("content-type", "")
-            assert "image/svg+xml" in content_type
-            
-            # Verify project was updated with new diagram data
-            updated_project = Project.objects.get(id=project_id)
-            assert updated_project.sequence_diagram_svg == mock_svg_content
-            assert "updated_action" in updated_project.sequence_diagram_source_code
+        monkeypatch.setattr(diagrams, "generate_sequence_diagram", AsyncMock(return_value=mock_result))
+        
+        response = await aclient.put(
+            "/api/endpoints/diagrams/sequence/update",
+            headers=auth_headers,
+            json={
+                "project_id": project_id,
+                "change_request": "Add new system component"
+            }
+        )
+        
+        assert_svg_response(response)
+        
+        # Verify project was updated with new diagram data
+        assert_stored(
+            project_id,
+            sequence_diagram_svg=MOCK_SVG_CONTENT,
+            sequence_diagram_source_code=mock_result["diagram_source"]
+        )
     
-    def test_sequence_diagram_project_not_found(self, auth_headers):
+    @pytest.mark.asyncio
+    async def test_sequence_diagram_project_not_found(self, aclient, auth_headers):
         """Test sequence diagram creation with non-existent project"""
-        from bson import ObjectId
         fake_project_id = str(ObjectId())
         
-        response = client.post(
+        response = await aclient.post(
             "/api/endpoints/diagrams/sequence/create",
             headers=auth_headers,
             json={"project_id": fake_project_id}
         )
         
-        print(f"Not found sequence response status: {response.status_code}")
-        print(f"Not found sequence response body: {response.text}")
-        
         assert response.status_code == 404
         assert "Project not found" in response.json()["detail"]
     
-    def test_sequence_diagram_requires_auth(self, sample_project_with_architecture):
+    @pytest.mark.asyncio
+    async def test_sequence_diagram_requires_auth(self, aclient, project_id):
         """Test that sequence diagram creation requires authentication"""
-        project_id = str(sample_project_with_architecture.id)
-        
-        response = client.post(
+        response = await aclient.post(
             "/api/endpoints/diagrams/sequence/create",
             json={"project_id": project_id}
         )
         
-        print(f"Unauth sequence response status: {response.status_code}")
-        print(f"Unauth sequence response body: {response.text}")
-        
         assert response.status_code == 401
 
 class TestClassDiagrams:
     """Test class for class diagram endpoints"""
     
-    def test_create_class_diagram_success(self, auth_headers, sample_project_with_architecture, mock_svg_content):
+    @pytest.mark.asyncio
+    async def test_create_class_diagram_success(self, aclient, monkeypatch, auth_headers, project_id):
         """Test successful class diagram creation"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Mock class diagram generation - fix relationship type
         mock_diagram_json = {
             "classes": [
@@ -326,36 +341,29 @@ class TestClassDiagrams:
         }
         
         # Fix: Mock at the endpoint import level, not the service level
-        with patch('app.api.endpoints.diagrams.generate_or_update_diagram', return_value=mock_diagram_json) as mock_generator:
-            with patch('app.api.endpoints.diagrams.generate_svg_from_json', return_value=mock_svg_content) as mock_svg:
-                response = client.post(
-                    "/api/endpoints/diagrams/class/create",
-                    headers=auth_headers,
-                    json={"project_id": project_id}
-                )
-                
-                print(f"Create class response status: {response.status_code}")
-                print(f"Create class response content type: {response.headers.get('content-type')}")
-                
-                assert response.status_code == 200
-                # Fix: Accept either content type format
-                content_type = response.headers.get("content-type", "")
-                assert "image/svg+xml" in content_type
-                assert b"<svg" in response.content
-                
-                # Verify AI services were called
-                mock_generator.assert_called_once()
-                mock_svg.assert_called_once_with(mock_diagram_json, "class")
-                
-                # Verify project was updated
-                updated_project = Project.objects.get(id=project_id)
-                assert updated_project.class_diagram_json == mock_diagram_json
-                assert updated_project.class_diagram_svg == mock_svg_content
+        mock_generator = AsyncMock(return_value=mock_diagram_json)
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", mock_generator)
+        mock_svg = MagicMock(return_value=MOCK_SVG_CONTENT)
+        monkeypatch.setattr(diagrams, "generate_svg_from_json", mock_svg)
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/class/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        assert_svg_response(response)
+        
+        # Verify AI services were called
+        mock_generator.assert_called_once()
+        mock_svg.assert_called_once_with(mock_diagram_json, "class")
+        
+        # Verify project was updated
+        assert_stored(project_id, class_diagram_json=mock_diagram_json, class_diagram_svg=MOCK_SVG_CONTENT)
     
-    def test_update_class_diagram_with_change_request(self, auth_headers, sample_project_with_architecture, mock_svg_content):
+    @pytest.mark.asyncio
+    async def test_update_class_diagram_with_change_request(self, aclient, monkeypatch, auth_headers, sample_project_with_architecture, project_id):
         """Test class diagram update with change request"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Set existing diagram data
         existing_diagram = {"classes": [], "relationships": []}
         project = sample_project_with_architecture
@@ -371,36 +379,35 @@ class TestClassDiagrams:
         }
         
         # Fix: Mock at the endpoint import level
-        with patch('app.api.endpoints.diagrams.generate_or_update_diagram', return_value=updated_diagram) as mock_generator:
-            with patch('app.api.endpoints.diagrams.generate_svg_from_json', return_value=mock_svg_content):
-                response = client.put(
-                    "/api/endpoints/diagrams/class/update",
-                    headers=auth_headers,
-                    json={
-                        "project_id": project_id,
-                        "change_request": "Rename User class to UpdatedUser"
-                    }
-                )
-                
-                print(f"Update class response status: {response.status_code}")
-                
-                assert response.status_code == 200
-                
-                # Verify the change request was passed to the AI service - fix call args check
-                mock_generator.assert_called_once()
-                # Check if call_args exists before accessing it
-                if mock_generator.call_args:
-                    call_args = mock_generator.call_args[1]  # kwargs
-                    assert call_args["change_request"] == "Rename User class to UpdatedUser"
-                    assert call_args["existing_json"] is not None
+        mock_generator = AsyncMock(return_value=updated_diagram)
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", mock_generator)
+        monkeypatch.setattr(diagrams, "generate_svg_from_json", MagicMock(return_value=MOCK_SVG_CONTENT))
+        
+        response = await aclient.put(
+            "/api/endpoints/diagrams/class/update",
+            headers=auth_headers,
+            json={
+                "project_id": project_id,
+                "change_request": "Rename User class to UpdatedUser"
+            }
+        )
+        
+        assert response.status_code == 200
+        
+        # Verify the change request was passed to the AI service - fix call args check
+        mock_generator.assert_called_once()
+        # Check if call_args exists before accessing it
+        if mock_generator.call_args:
+            call_args = mock_generator.call_args[1]  # kwargs
+            assert call_args["change_request"] == "Rename User class to UpdatedUser"
+            assert call_args["existing_json"] is not None
 
 class TestActivityDiagrams:
     """Test class for activity diagram endpoints"""
     
-    def test_create_activity_diagram_success(self, auth_headers, sample_project_with_architecture, mock_svg_content):
+    @pytest.mark.asyncio
+    async def test_create_activity_diagram_success(self, aclient, monkeypatch, auth_headers, project_id):
         """Test successful activity diagram creation"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Mock activity diagram generation
         mock_diagram_json = {
             "nodes": [
@@ -415,128 +422,185 @@ class TestActivityDiagrams:
         }
         
         # Fix: Mock at the endpoint import level
-        with patch('app.api.endpoints.diagrams.generate_or_update_diagram', return_value=mock_diagram_json) as mock_generator:
-            with patch('app.api.endpoints.diagrams.generate_svg_from_json', return_value=mock_svg_content) as mock_svg:
-                response = client.post(
-                    "/api/endpoints/diagrams/activity/create",
-                    headers=auth_headers,
-                    json={"project_id": project_id}
-                )
-                
-                print(f"Create activity response status: {response.status_code}")
-                print(f"Create activity response content type: {response.headers.get('content-type')}")
-                
-                assert response.status_code == 200
-                # Fix: Accept either content type format
-                content_type = response.headers.get("content-type", "")
-                assert "image/svg+xml" in content_type
-                
-                # Verify AI services were called with correct diagram type
-                mock_generator.assert_called_once()
-                call_args = mock_generator.call_args[1]
-                assert call_args["diagram_type"] == "activity"
-                
-                mock_svg.assert_called_once_with(mock_diagram_json, "activity")
-                
-                # Verify project was updated
-                updated_project = Project.objects.get(id=project_id)
-                assert updated_project.activity_diagram_json == mock_diagram_json
-                assert updated_project.activity_diagram_svg == mock_svg_content
+        mock_generator = AsyncMock(return_value=mock_diagram_json)
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", mock_generator)
+        mock_svg = MagicMock(return_value=MOCK_SVG_CONTENT)
+        monkeypatch.setattr(diagrams, "generate_svg_from_json", mock_svg)
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/activity/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        assert_svg_response(response)
+        
+        # Verify AI services were called with correct diagram type
+        mock_generator.assert_called_once()
+        call_args = mock_generator.call_args[1]
+        assert call_args["diagram_type"] == "activity"
+        
+        mock_svg.assert_called_once_with(mock_diagram_json, "activity")
+        
+        # Verify project was updated
+        assert_stored(project_id, activity_diagram_json=mock_diagram_json, activity_diagram_svg=MOCK_SVG_CONTENT)
 
 class TestDiagramErrors:
     """Test class for diagram error scenarios"""
     
-    def test_diagram_generation_service_exception(self, auth_headers, sample_project_with_architecture):
+    @pytest.mark.asyncio
+    async def test_diagram_generation_service_exception(self, aclient, monkeypatch, auth_headers, project_id):
         """Test handling of diagram generation service exceptions"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Mock service exception at the endpoint level - this should cause a 500 error
-        with patch('app.api.endpoints.diagrams.generate_or_update_diagram', side_effect=Exception("AI service error")):
-            response = client.post(
-                "/api/endpoints/diagrams/class/create",
-                headers=auth_headers,
-                json={"project_id": project_id}
-            )
-            
-            print(f"Service error response status: {response.status_code}")
-            print(f"Service error response body: {response.text}")
-            
-            # The endpoint should handle the exception and return 500
-            assert response.status_code == 500
-            assert "Failed to create diagram" in response.json()["detail"]
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", AsyncMock(side_effect=Exception("AI service error")))
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/class/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        # The endpoint should handle the exception and return 500
+        assert response.status_code == 500
+        assert "Failed to create diagram" in response.json()["detail"]
     
-    def test_svg_generation_failure(self, auth_headers, sample_project_with_architecture):
+    @pytest.mark.asyncio
+    async def test_svg_generation_failure(self, aclient, monkeypatch, auth_headers, project_id):
         """Test handling of SVG generation failures"""
-        project_id = str(sample_project_with_architecture.id)
-        
         mock_diagram_json = {"classes": [], "relationships": []}
         
         # Fix: Mock at the endpoint level where functions are imported
-        with patch('app.api.endpoints.diagrams.generate_or_update_diagram', return_value=mock_diagram_json):
-            with patch('app.api.endpoints.diagrams.generate_svg_from_json', side_effect=Exception("SVG generation failed")):
-                response = client.post(
-                    "/api/endpoints/diagrams/class/create",
-                    headers=auth_headers,
-                    json={"project_id": project_id}
-                )
-                
-                print(f"SVG error response status: {response.status_code}")
-                print(f"SVG error response body: {response.text}")
-                
-                assert response.status_code == 500
-                assert "Failed to create diagram" in response.json()["detail"]
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", AsyncMock(return_value=mock_diagram_json))
+        monkeypatch.setattr(diagrams, "generate_svg_from_json", MagicMock(side_effect=Exception("SVG generation failed")))
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/class/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        assert response.status_code == 500
+        assert "Failed to create diagram" in response.json()["detail"]
 
 class TestDiagramIntegration:
     """Integration tests for diagram workflows"""
     
-    def test_multiple_diagram_types_for_same_project(self, auth_headers, sample_project_with_architecture, mock_svg_content):
+    @pytest.mark.asyncio
+    async def test_multiple_diagram_types_for_same_project(self, aclient, monkeypatch, auth_headers, project_id):
         """Test creating multiple diagram types for the same project"""
-        project_id = str(sample_project_with_architecture.id)
-        
         # Mock all diagram services
-        mock_sequence_result = {"success": True, "svg": mock_svg_content, "diagram_source": "sequence code"}
+        mock_sequence_result = {"success": True, "svg": MOCK_SVG_CONTENT, "diagram_source": "sequence code"}
         mock_class_json = {"classes": [], "relationships": []}
         mock_activity_json = {"nodes": [], "flows": []}
         
+        async def fake_generate(**kwargs):
+            return mock_activity_json if kwargs["diagram_type"] == "activity" else mock_class_json
+        
         # Fix: Mock sequence diagram at the correct path and class/activity at endpoint level
-        with patch('app.api.endpoints.diagrams.generate_sequence_diagram', return_value=mock_sequence_result):
-            with patch('app.api.endpoints.diagrams.generate_or_update_diagram', return_value=mock_class_json):
-                with patch('app.api.endpoints.diagrams.generate_svg_from_json', return_value=mock_svg_content):
-                    
-                    # Create sequence diagram
-                    seq_response = client.post(
-                        "/api/endpoints/diagrams/sequence/create",
-                        headers=auth_headers,
-                        json={"project_id": project_id}
-                    )
-                    
-                    # Create class diagram
-                    class_response = client.post(
-                        "/api/endpoints/diagrams/class/create",
-                        headers=auth_headers,
-                        json={"project_id": project_id}
-                    )
-                    
-                    # Create activity diagram  
-                    with patch('app.api.endpoints.diagrams.generate_or_update_diagram', return_value=mock_activity_json):
-                        activity_response = client.post(
-                            "/api/endpoints/diagrams/activity/create",
-                            headers=auth_headers,
-                            json={"project_id": project_id}
-                        )
-                    
-                    # All should succeed
-                    assert seq_response.status_code == 200
-                    assert class_response.status_code == 200
-                    assert activity_response.status_code == 200
-                    
-                    # Verify project has all diagram types
-                    updated_project = Project.objects.get(id=project_id)
-                    assert updated_project.sequence_diagram_svg is not None
-                    assert updated_project.class_diagram_json is not None
-                    assert updated_project.activity_diagram_json is not None
-                    
-                    print("✅ Multiple diagram types created successfully!")
+        monkeypatch.setattr(diagrams, "generate_sequence_diagram", AsyncMock(return_value=mock_sequence_result))
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", fake_generate)
+        monkeypatch.setattr(diagrams, "generate_svg_from_json", MagicMock(return_value=MOCK_SVG_CONTENT))
+        
+        # Create all three diagrams concurrently, sending one pre-encoded body
+        create_body = orjson.dumps({"project_id": project_id})
+        json_headers = {**auth_headers, "Content-Type": "application/json"}
+        seq_response, class_response, activity_response = await asyncio.gather(
+            aclient.post("/api/endpoints/diagrams/sequence/create", headers=json_headers, content=create_body),
+            aclient.post("/api/endpoints/diagrams/class/create", headers=json_headers, content=create_body),
+            aclient.post("/api/endpoints/diagrams/activity/create", headers=json_headers, content=create_body)
+        )
+        
+        # All should succeed
+        for response in (seq_response, class_response, activity_response):
+            assert_svg_response(response)
+        
+        # Verify project has all diagram types - concurrent saves must not overwrite each other
+        assert_stored(
+            project_id,
+            sequence_diagram_svg=MOCK_SVG_CONTENT,
+            class_diagram_json=mock_class_json,
+            activity_diagram_json=mock_activity_json
+        )
+        
+    @pytest.mark.asyncio
+    async def test_svg_rendering_runs_off_the_event_loop(self, aclient, monkeypatch, auth_headers, project_id):
+        """Test that the blocking Graphviz render runs in a worker thread, not on the event loop thread"""
+        threads = {}
+        
+        async def fake_generate(**kwargs):
+            threads["event_loop"] = threading.get_ident()
+            return {"classes": [], "relationships": []}
+        
+        def fake_render(diagram_json, diagram_type):
+            threads["render"] = threading.get_ident()
+            return MOCK_SVG_CONTENT
+        
+        monkeypatch.setattr(diagrams, "generate_or_update_diagram", fake_generate)
+        monkeypatch.setattr(diagrams, "generate_svg_from_json", fake_render)
+        
+        response = await aclient.post(
+            "/api/endpoints/diagrams/class/create",
+            headers=auth_headers,
+            json={"project_id": project_id}
+        )
+        
+        assert response.status_code == 200
+        assert threads["render"] != threads["event_loop"]
+
+class TestStoredDiagrams:
+    """Test class for retrieving stored diagram SVGs"""
+    
+    @pytest.mark.asyncio
+    async def test_get_stored_class_diagram(self, aclient, auth_headers, sample_project_with_architecture):
+        """Test that the stored SVG is returned for the owner"""
+        sample_project_with_architecture.class_diagram_svg = MOCK_SVG_CONTENT
+        sample_project_with_architecture.save()
+        
+        response = await aclient.get(
+            f"/api/endpoints/diagrams/class/{sample_project_with_architecture.id}",
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 200
+        assert "image/svg+xml" in response.headers.get("content-type", "")
+        assert response.text == MOCK_SVG_CONTENT
+    
+    @pytest.mark.asyncio
+    async def test_get_stored_diagram_denied_for_other_user(self, aclient, auth_headers, verified_user):
+        """Test that a project owned by someone else is not readable"""
+        other_user = User.create_user(
+            email="other@example.com",
+            password="otherpassword123",
+            full_name="Other User"
+        )
+        project = Project(name="Private", owner_id=other_user, activity_diagram_svg=MOCK_SVG_CONTENT).save()
+        
+        response = await aclient.get(f"/api/endpoints/diagrams/activity/{project.id}", headers=auth_headers)
+        
+        assert response.status_code == 403
+    
+    @pytest.mark.asyncio
+    async def test_get_stored_diagram_for_collaborator_skips_user_lookups(self, aclient, auth_headers, verified_user):
+        """Test that a collaborator can read the SVG without any User being dereferenced"""
+        owner = User.create_user(
+            email="owner@example.com",
+            password="ownerpassword123",
+            full_name="Owner User"
+        )
+        project = Project(
+            name="Shared",
+            owner_id=owner,
+            collaborator_ids=[verified_user],
+            sequence_diagram_svg=MOCK_SVG_CONTENT
+        ).save()
+        
+        with patch.object(User, "_from_son", wraps=User._from_son) as user_loads:
+            response = await aclient.get(f"/api/endpoints/diagrams/sequence/{project.id}", headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert response.text == MOCK_SVG_CONTENT
+        # Only the authenticated user is loaded (by get_current_user), never the owner or collaborators
+        assert user_loads.call_count == 1
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
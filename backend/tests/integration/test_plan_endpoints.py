@@ -21,15 +21,14 @@ settings = get_settings()
 
 # Test database setup
 @pytest.fixture(scope="session", autouse=True)
-def setup_test_database():
+def setup_test_database(mongodb_test_uri, mongodb_test_db_name):
     """Set up test database connection"""
     # Disconnect any existing connections
     disconnect()
     
     # Connect to test database
-    test_db_name = "projectron_test"
     connect(
-        host=f"mongodb://localhost:27017/{test_db_name}",
+        host=f"{mongodb_test_uri}/{mongodb_test_db_name}",
         uuidRepresentation='standard'
     )
     
@@ -40,16 +39,16 @@ def setup_test_database():
 
 @pytest.fixture(autouse=True)
 def clean_database():
-    """Clean database before each test"""
+    """Clean database before each test, keeping collection indexes"""
     # Clear all collections before each test
-    User.drop_collection()
-    Project.drop_collection()
-    PlanProgress.drop_collection()
+    User._get_collection().delete_many({})
+    Project._get_collection().delete_many({})
+    PlanProgress._get_collection().delete_many({})
     yield
     # Clean up after test
-    User.drop_collection()
-    Project.drop_collection()
-    PlanProgress.drop_collection()
+    User._get_collection().delete_many({})
+    Project._get_collection().delete_many({})
+    PlanProgress._get_collection().delete_many({})
 
 @pytest.fixture
 def verified_user():
@@ -74,8 +73,7 @@ def authenticated_user_token(verified_user):
     
     response = client.post(
         "/api/endpoints/auth/token",
-        data=login_data,
-        headers={"Content-Type": "application/x-www-form-urlencoded"}
+        data=login_data
     )
     
     assert response.status_code == 200
@@ -116,4 +116,11 @@ class TestUserModel:
         assert "user" in oauth_data["roles"]
         assert oauth_data["oauth_provider"] in ["google", "github"]
         assert len(oauth_data["oauth_id"]) > 0
-        assert "@" in oauth_data["email"]
\ No newline at end of file
+        assert "@" in oauth_data["email"]
+    
+    def test_token_lookups_are_indexed(self):
+        """Test that verification and reset token lookups are backed by sparse indexes"""
+        specs = {spec["fields"][0][0]: spec for spec in User._meta["index_specs"]}
+        
+        assert specs["verification_token"]["sparse"] is True
+        assert specs["reset_password_token"]["sparse"] is True
@@ -0,0 +1,66 @@
+# tests/unit/test_class_diagram_service.py
+import pytest
+
+from app.services.ai.class_diagram_service import validate_activity_diagram
+
+
+def activity_diagram(flows):
+    """Build a small activity diagram with a decision node and the given flows"""
+    return {
+        "nodes": [
+            {"id": "start", "type": "start", "label": "Start"},
+            {"id": "check", "type": "decision", "label": "Valid?"},
+            {"id": "save", "type": "activity", "label": "Save"},
+            {"id": "end", "type": "end", "label": "End"},
+        ],
+        "flows": flows,
+    }
+
+@pytest.mark.unit
+class TestValidateActivityDiagram:
+    """Unit tests for activity diagram validation"""
+
+    def test_valid_diagram(self):
+        """Test that a well-formed diagram with conditional decision flows passes"""
+        diagram = activity_diagram([
+            {"source": "start", "target": "check"},
+            {"source": "check", "target": "save", "condition": "yes"},
+            {"source": "check", "target": "end", "condition": "no"},
+            {"source": "save", "target": "end"},
+        ])
+
+        assert validate_activity_diagram(diagram) == (True, "")
+
+    def test_decision_flow_requires_condition(self):
+        """Test that a flow leaving a decision node without a condition is rejected"""
+        diagram = activity_diagram([
+            {"source": "start", "target": "check"},
+            {"source": "check", "target": "save"},
+        ])
+
+        assert validate_activity_diagram(diagram) == (
+            False, "Flow at index 1 from decision node 'check' missing condition"
+        )
+
+    def test_flow_to_unknown_node(self):
+        """Test that flows must reference defined nodes"""
+        diagram = activity_diagram([{"source": "start", "target": "missing"}])
+
+        assert validate_activity_diagram(diagram) == (
+            False, "Flow at index 0 has target 'missing' that is not a defined node"
+        )
+
+    def test_missing_end_node(self):
+        """Test that a diagram without an end node is rejected before flows are checked"""
+        diagram = activity_diagram([])
+        diagram["nodes"] = [node for node in diagram["nodes"] if node["type"] != "end"]
+
+        assert validate_activity_diagram(diagram) == (
+            False, "Activity diagram must have at least one end node"
+        )
+
+    def test_invalid_node_reported_first(self):
+        """Test that node field errors take precedence over start/end checks"""
+        diagram = {"nodes": [{"id": "a", "type": "start"}], "flows": []}
+
+        assert validate_activity_diagram(diagram) == (False, "Node at index 0 missing required field 'label'")
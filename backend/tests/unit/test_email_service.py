@@ -0,0 +1,97 @@
+# tests/unit/test_email_service.py
+import aiosmtplib
+import pytest
+from email import message_from_string
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.services import email_service
+from app.services.email_service import EmailService
+
+@pytest.fixture
+def smtp_connections():
+    """Patch aiosmtplib.SMTP and collect every connection the service opens"""
+    connections = []
+
+    def open_connection(*args, **kwargs):
+        connection = MagicMock()
+        connection.connect = AsyncMock()
+        connection.login = AsyncMock()
+        connection.sendmail = AsyncMock()
+        connection.quit = AsyncMock()
+        connection.noop = AsyncMock(return_value=MagicMock(code=250))
+        connections.append(connection)
+        return connection
+
+    email_service._smtp_connection.client = None
+    with patch("app.services.email_service.aiosmtplib.SMTP", side_effect=open_connection):
+        yield connections
+    email_service._smtp_connection.client = None
+
+@pytest.mark.unit
+class TestEmailServiceConnection:
+    """Unit tests for SMTP connection reuse"""
+
+    @pytest.mark.asyncio
+    async def test_consecutive_emails_reuse_connection(self, smtp_connections):
+        """Test that several emails are sent over a single authenticated session"""
+        assert await EmailService.send_verification_email("user@example.com", "token-1") is True
+        assert await EmailService.send_password_reset_email("user@example.com", "token-2") is True
+
+        assert len(smtp_connections) == 1
+        connection = smtp_connections[0]
+        connection.login.assert_awaited_once()
+        assert connection.sendmail.await_count == 2
+        connection.quit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_reconnects_once_when_server_disconnected(self, smtp_connections):
+        """Test that a dropped session is replaced and the email is retried"""
+        await EmailService.send_verification_email("user@example.com", "token-1")
+        smtp_connections[0].sendmail.side_effect = aiosmtplib.SMTPServerDisconnected("gone")
+
+        assert await EmailService.send_verification_email("user@example.com", "token-2") is True
+
+        assert len(smtp_connections) == 2
+        smtp_connections[1].sendmail.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_send_failure_returns_false(self, smtp_connections):
+        """Test that an SMTP error is reported as a failed send"""
+        await EmailService.send_verification_email("user@example.com", "token-1")
+        smtp_connections[0].sendmail.side_effect = aiosmtplib.SMTPRecipientsRefused([])
+
+        assert await EmailService.send_verification_email("user@example.com", "token-2") is False
+
+    @pytest.mark.asyncio
+    async def test_send_failure_is_logged(self, smtp_connections, caplog):
+        """Test that a failed send is reported through the module logger with its traceback"""
+        await EmailService.send_verification_email("user@example.com", "token-1")
+        smtp_connections[0].sendmail.side_effect = aiosmtplib.SMTPRecipientsRefused([])
+
+        with caplog.at_level("ERROR", logger="app.services.email_service"):
+            await EmailService.send_password_reset_email("user@example.com", "token-2")
+
+        assert "Failed to send password reset email" in caplog.text
+        assert caplog.records[-1].exc_info is not None
+
+@pytest.mark.unit
+class TestContactFormEmail:
+    """Unit tests for the contact form email body"""
+
+    @pytest.mark.asyncio
+    async def test_user_input_is_html_escaped(self, smtp_connections):
+        """Test that markup in submitted fields is escaped in the HTML body"""
+        await EmailService.send_contact_form_email(
+            name="<b>Mallory</b>",
+            email="mallory@example.com",
+            inquiry_type="bug",
+            subject="Broken <script>alert(1)</script>",
+            message="Steps & details: <img src=x onerror=alert(1)>",
+        )
+
+        sent = message_from_string(smtp_connections[0].sendmail.call_args[0][2])
+        html_body = sent.get_payload()[0].get_payload(decode=True).decode("utf-8")
+        assert "<script>" not in html_body
+        assert "<img src=x" not in html_body
+        assert "&lt;b&gt;Mallory&lt;/b&gt;" in html_body
+        assert "🐛 Bug" in html_body
@@ -4,7 +4,11 @@ from datetime import datetime, timezone
 from bson import ObjectId
 from unittest.mock import patch, MagicMock
 
-from app.utils.mongo_encoder import serialize_mongodb_doc
+from app.utils.mongo_encoder import (
+    MongoJSONResponse,
+    serialize_mongodb_doc,
+    serialize_mongodb_doc_bytes,
+)
 
 @pytest.mark.unit
 class TestMongoEncoder:
@@ -202,4 +206,46 @@ class TestMongoEncoder:
         assert result["dict_field"] == {"nested": "value"}
         assert result["empty_string"] == ""
         assert result["zero_int"] == 0
-        assert result["false_bool"] == False
\ No newline at end of file
+        assert result["false_bool"] == False
+
+    def test_serialize_to_bytes_matches_fastapi_encoding(self):
+        """Test JSON bytes output matches what jsonable_encoder produced for the same document"""
+        from fastapi.encoders import jsonable_encoder
+        import json
+
+        object_id = ObjectId()
+        document = {
+            "_id": object_id,
+            "owner_id": ObjectId(),
+            "created_at": datetime(2024, 1, 15, 10, 30, 45, 123000),
+            "updated_at": datetime(2024, 1, 15, 10, 30, 45, tzinfo=timezone.utc),
+            "milestones": [{"name": "Setup", "tasks": [], "due": None}],
+            "skipped": None
+        }
+
+        result = json.loads(serialize_mongodb_doc_bytes(document))
+
+        assert result == jsonable_encoder(serialize_mongodb_doc(document))
+        assert result["id"] == str(object_id)
+        assert "skipped" not in result
+
+
+    def test_mongo_json_response_encodes_object_ids(self):
+        """Test the default response class renders ObjectIds and datetimes"""
+        object_id = ObjectId()
+
+        response = MongoJSONResponse({"id": object_id, "created_at": datetime(2024, 1, 15, 10, 30, 45)})
+
+        assert response.body == f'{{"id":"{object_id}","created_at":"2024-01-15T10:30:45"}}'.encode()
+        assert response.media_type == "application/json"
+
+    def test_serialize_returns_same_object_when_nothing_to_convert(self):
+        """Test already JSON-safe subtrees are passed through without copying"""
+        tasks = [{"name": "Setup", "subtasks": [{"name": "Repo"}]}]
+        document = {"name": "project", "tasks": tasks, "owner_id": ObjectId()}
+
+        result = serialize_mongodb_doc(document)
+
+        assert result is not document
+        assert result["tasks"] is tasks
+        assert serialize_mongodb_doc(tasks) is tasks
@@ -59,4 +59,11 @@ class TestProjectModel:
         # We're just testing the logic here
         invalid_sizes = [0, -1, -5]
         for size in invalid_sizes:
-            assert size < 1  # Our validation logic
\ No newline at end of file
+            assert size < 1  # Our validation logic
+    
+    def test_collaborator_ids_is_indexed(self):
+        """Test that the collaborator branch of the project list query has an index"""
+        index_fields = [spec["fields"] for spec in Project._meta["index_specs"]]
+        
+        assert [("owner_id", 1), ("name", 1)] in index_fields
+        assert [("collaborator_ids", 1)] in index_fields
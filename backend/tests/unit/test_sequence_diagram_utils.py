@@ -0,0 +1,418 @@
+# tests/unit/test_sequence_diagram_utils.py
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain.schema import HumanMessage
+
+from app.services.ai import sequence_diagram_service
+from app.services.ai.sequence_diagram_service import (
+    execute_llm_with_fallbacks,
+    extract_code_from_text,
+    extract_json_from_text,
+    json_to_sequence_diagram_code,
+    normalize_sequencediagram,
+)
+
+@pytest.mark.unit
+class TestExtractJsonFromText:
+    """Unit tests for pulling JSON out of LLM responses"""
+
+    def test_extract_json_from_json_fence(self):
+        """Test JSON inside a ```json fence is returned"""
+        text = 'Here you go:\n```json\n{"title": "Login"}\n```\nDone.'
+
+        assert extract_json_from_text(text) == '{"title": "Login"}'
+
+    def test_extract_json_stops_at_first_balanced_object(self):
+        """Test trailing prose with braces is not swallowed into the JSON"""
+        text = 'Result: {"participants": [{"name": "User"}]} Let me know if {anything} changes.'
+
+        result = extract_json_from_text(text)
+
+        assert json.loads(result) == {"participants": [{"name": "User"}]}
+
+    def test_extract_json_ignores_braces_inside_strings(self):
+        """Test braces and escaped quotes inside string values don't end the object"""
+        text = '{"text": "returns {token} \\"ok\\"", "n": 1} trailing }'
+
+        result = extract_json_from_text(text)
+
+        assert json.loads(result) == {"text": 'returns {token} "ok"', "n": 1}
+
+    def test_extract_json_unbalanced_falls_back_to_last_brace(self):
+        """Test unbalanced braces fall back to the span ending at the last closing brace"""
+        text = '{"a": {"b": 1} end'
+
+        assert extract_json_from_text(text) == '{"a": {"b": 1}'
+
+    def test_extract_json_without_object_returns_text(self):
+        """Test text without any JSON object is returned stripped"""
+        assert extract_json_from_text("  no json here  ") == "no json here"
+
+
+@pytest.mark.unit
+class TestExtractCodeFromText:
+    """Unit tests for pulling sequence diagram code out of LLM responses"""
+
+    def test_sequence_fence_preferred_over_earlier_plain_fence(self):
+        """Test a ```sequence block wins even when a plain fence comes first"""
+        text = 'Notes:\n```\nnot this\n```\nCode:\n```sequence\nA -> B: hi\n```'
+
+        assert extract_code_from_text(text) == "A -> B: hi"
+
+    def test_plain_fence_used_without_sequence_fence(self):
+        """Test the first plain fenced block is returned when there is no ```sequence block"""
+        assert extract_code_from_text('```\nA -> B: hi\n```') == "A -> B: hi"
+
+    def test_unfenced_text_is_returned_stripped(self):
+        """Test raw text is returned as-is apart from surrounding whitespace"""
+        assert extract_code_from_text('  "User" -> "Auth API": login  ') == '"User" -> "Auth API": login'
+
+
+@pytest.mark.unit
+class TestNormalizeSequenceDiagram:
+    """Unit tests for stripping redundant quotes from diagram code"""
+
+    def test_quotes_removed_only_without_whitespace(self):
+        """Test single-word names lose their quotes while multi-word names keep them"""
+        assert normalize_sequencediagram('"User" -> "Auth API": login') == 'User -> "Auth API": login'
+
+    def test_normalizing_twice_is_a_no_op(self):
+        """Test already normalized code comes back unchanged"""
+        once = normalize_sequencediagram('"User" -> "DB": query')
+
+        assert normalize_sequencediagram(once) == once == "User -> DB: query"
+
+
+@pytest.mark.unit
+class TestJsonToSequenceDiagramCode:
+    """Unit tests for converting diagram JSON to sequencediagram.org syntax"""
+
+    def test_messages_with_activation_and_dashed_arrow(self):
+        """Test top-level messages emit activation, arrow type and deactivation lines"""
+        diagram_json = {
+            "title": "Login",
+            "participants": [{"name": "User", "type": "actor"}, {"name": "Auth API", "alias": "API"}],
+            "messages": [
+                {"from": "User", "to": "API", "text": "POST /login", "activate": True},
+                {"from": "API", "to": "User", "text": "token", "type": "dashed", "deactivate": True},
+            ],
+        }
+
+        code = json_to_sequence_diagram_code(diagram_json)
+
+        assert code.splitlines() == [
+            "title Login",
+            "",
+            "actor User",
+            'participant "Auth API" as API',
+            "",
+            "+API",
+            "User -> API: POST /login",
+            "API --> User: token",
+            "-User",
+        ]
+
+    def test_alt_group_with_alternatives(self):
+        """Test alt groups emit their messages, else branches and a closing end"""
+        diagram_json = {
+            "groups": [
+                {
+                    "type": "alt",
+                    "label": "valid credentials",
+                    "messages": [{"from": "API", "to": "User", "text": "200"}],
+                    "alternatives": [
+                        {"label": "invalid", "messages": [{"from": "API", "to": "User", "text": "401", "type": "dashed"}]},
+                        {"label": "locked"},
+                    ],
+                },
+                {"type": "loop", "label": "retry", "messages": [{"from": "User", "to": "API", "text": "again"}]},
+            ],
+        }
+
+        code = json_to_sequence_diagram_code(diagram_json)
+
+        assert code.splitlines() == [
+            "",
+            "alt valid credentials",
+            "API -> User: 200",
+            "else invalid",
+            "API --> User: 401",
+            "else locked",
+            "end",
+            "",
+            "loop retry",
+            "User -> API: again",
+            "end",
+        ]
+
+    def test_notes_are_split_into_start_and_end(self):
+        """Test start notes precede messages, end notes close the diagram, and no empty trailing spacer is added"""
+        diagram_json = {
+            "notes": [
+                {"participant": "API", "position": "end", "text": "done"},
+                {"participant": "User", "position": "start", "text": "begin"},
+            ],
+            "messages": [{"from": "User", "to": "API", "text": "ping"}],
+        }
+
+        code = json_to_sequence_diagram_code(diagram_json)
+
+        assert code.splitlines() == [
+            "",
+            "note over User: begin",
+            "",
+            "User -> API: ping",
+            "",
+            "note over API: done",
+        ]
+
+    def test_no_end_notes_leaves_no_trailing_blank_line(self):
+        """Test a diagram without end notes doesn't end with an empty spacer line"""
+        diagram_json = {
+            "notes": [{"participant": "User", "position": "start", "text": "begin"}],
+            "messages": [{"from": "User", "to": "API", "text": "ping"}],
+        }
+
+        code = json_to_sequence_diagram_code(diagram_json)
+
+        assert not code.endswith("\n")
+
+
+@pytest.fixture
+def primary_breaker():
+    """Reset the primary LLM breaker and prompt cache around each test"""
+    sequence_diagram_service._primary_breaker.update(fails=0, open_until=0.0)
+    sequence_diagram_service._prompt_cache.clear()
+    yield sequence_diagram_service._primary_breaker
+    sequence_diagram_service._primary_breaker.update(fails=0, open_until=0.0)
+    sequence_diagram_service._prompt_cache.clear()
+
+
+@pytest.mark.unit
+class TestExecuteLlmWithFallbacks:
+    """Unit tests for the primary LLM short-circuit"""
+
+    @pytest.mark.asyncio
+    async def test_primary_skipped_after_consecutive_failures(self, primary_breaker):
+        """Test the primary is not called while its breaker is open"""
+        primary = MagicMock()
+        primary.ainvoke = AsyncMock(side_effect=Exception("rate limited"))
+        fallback = MagicMock()
+        fallback.ainvoke = AsyncMock(return_value="fallback result")
+
+        for n in range(sequence_diagram_service.PRIMARY_LLM_FAILURE_THRESHOLD + 2):
+            messages = [HumanMessage(content=f"prompt {n}")]
+            assert await execute_llm_with_fallbacks(primary, [fallback], messages) == "fallback result"
+
+        assert primary.ainvoke.await_count == sequence_diagram_service.PRIMARY_LLM_FAILURE_THRESHOLD
+        assert fallback.ainvoke.await_count == sequence_diagram_service.PRIMARY_LLM_FAILURE_THRESHOLD + 2
+
+    @pytest.mark.asyncio
+    async def test_primary_success_resets_failure_count(self, primary_breaker):
+        """Test a successful primary call clears earlier failures"""
+        primary = MagicMock()
+        primary.ainvoke = AsyncMock(side_effect=[Exception("boom"), Exception("boom"), "primary result"])
+        fallback = MagicMock()
+        fallback.ainvoke = AsyncMock(return_value="fallback result")
+
+        for n in range(3):
+            await execute_llm_with_fallbacks(primary, [fallback], [HumanMessage(content=f"prompt {n}")])
+
+        assert primary_breaker["fails"] == 0
+        assert primary_breaker["open_until"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_primary_tried_when_open_without_fallbacks(self, primary_breaker):
+        """Test the primary is still used when there is nothing to fall back to"""
+        primary_breaker["open_until"] = float("inf")
+        primary = MagicMock()
+        primary.ainvoke = AsyncMock(return_value="primary result")
+
+        assert await execute_llm_with_fallbacks(primary, [], []) == "primary result"
+
+
+@pytest.mark.unit
+class TestHedgedFallbacks:
+    """Unit tests for racing fallback LLMs against a slow primary"""
+
+    @staticmethod
+    def _llm(result=None, delay=0.0, error=None):
+        async def ainvoke(messages):
+            await asyncio.sleep(delay)
+            if error:
+                raise error
+            return result
+
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock(side_effect=ainvoke)
+        return llm
+
+    @pytest.mark.asyncio
+    async def test_fast_fallback_beats_slow_primary(self, primary_breaker):
+        """Test the first successful response wins and the slow primary is cancelled"""
+        primary_cancelled = asyncio.Event()
+
+        async def slow_primary(messages):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                primary_cancelled.set()
+                raise
+
+        primary = MagicMock()
+        primary.ainvoke = AsyncMock(side_effect=slow_primary)
+        fallback = self._llm(result="fallback result")
+
+        result = await sequence_diagram_service._execute_llm_hedged(
+            primary, [fallback], [], "test", hedge_delay=0.01, max_concurrent_fallbacks=2
+        )
+
+        assert result == "fallback result"
+        await asyncio.sleep(0)
+        assert primary_cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_primary_within_hedge_delay_skips_fallbacks(self, primary_breaker):
+        """Test fallbacks are never started when the primary answers within its head start"""
+        primary = self._llm(result="primary result")
+        fallback = self._llm(result="fallback result")
+
+        result = await sequence_diagram_service._execute_llm_hedged(
+            primary, [fallback], [], "test", hedge_delay=1.0, max_concurrent_fallbacks=2
+        )
+
+        assert result == "primary result"
+        fallback.ainvoke.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_queued_fallback_starts_after_failure(self, primary_breaker):
+        """Test fallbacks beyond the concurrency cap start as earlier ones fail"""
+        primary = self._llm(error=Exception("primary down"))
+        failing = self._llm(error=Exception("fallback down"))
+        last = self._llm(result="last result")
+
+        result = await sequence_diagram_service._execute_llm_hedged(
+            primary, [failing, last], [], "test", hedge_delay=1.0, max_concurrent_fallbacks=1
+        )
+
+        assert result == "last result"
+        assert primary_breaker["fails"] == 1
+
+    @pytest.mark.asyncio
+    async def test_all_fail_raises_last_error(self, primary_breaker):
+        """Test the last error is raised when every model fails"""
+        primary = self._llm(error=Exception("primary down"))
+        fallback = self._llm(error=ValueError("fallback down"))
+
+        with pytest.raises(ValueError, match="fallback down"):
+            await sequence_diagram_service._execute_llm_hedged(
+                primary, [fallback], [], "test", hedge_delay=1.0, max_concurrent_fallbacks=2
+            )
+
+
+@pytest.fixture
+def diagram_pipeline():
+    """Stub the Selenium generator and fallback LLMs around generate_sequence_diagram, with the cache on"""
+    generator = MagicMock()
+    generator.validate_diagram_threadsafe = AsyncMock(return_value=(True, ""))
+    generator.generate_svg_threadsafe = AsyncMock(return_value="<svg/>")
+    with patch.object(sequence_diagram_service, "get_global_generator", return_value=generator), \
+         patch.object(sequence_diagram_service, "get_cached_llm", side_effect=Exception("no fallbacks")), \
+         patch.object(sequence_diagram_service.settings, "LLM_PROMPT_CACHE_TTL_SECONDS", 3600):
+        yield generator
+
+
+def diagram_llm(model_name="gpt-4.1", reply='{"messages": [{"from": "User", "to": "API", "text": "login"}]}'):
+    """Build a stand-in chat model for model_name that always gives the same reply"""
+    llm = MagicMock()
+    llm.model_name = model_name
+    llm.ainvoke = AsyncMock(return_value=MagicMock(content=reply))
+    return llm
+
+
+@pytest.mark.unit
+class TestPromptCache:
+    """Unit tests for reusing successful diagrams for identical requests"""
+
+    @pytest.mark.asyncio
+    async def test_identical_request_served_from_cache(self, primary_breaker, diagram_pipeline):
+        """Test a repeated request doesn't call the LLM or render again"""
+        llm = diagram_llm()
+
+        first = await sequence_diagram_service.generate_sequence_diagram("plan", llm)
+        second = await sequence_diagram_service.generate_sequence_diagram("plan", llm)
+
+        assert first["success"] and first == second
+        llm.ainvoke.assert_awaited_once()
+        diagram_pipeline.generate_svg_threadsafe.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_different_change_request_calls_llm(self, primary_breaker, diagram_pipeline):
+        """Test requests differing only in their change request get separate diagrams"""
+        llm = diagram_llm()
+
+        await sequence_diagram_service.generate_sequence_diagram("plan", llm, change_request="add logout")
+        await sequence_diagram_service.generate_sequence_diagram("plan", llm, change_request="add signup")
+
+        assert llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_model_is_part_of_the_key(self, primary_breaker, diagram_pipeline):
+        """Test a diagram generated for one model isn't served for another"""
+        first, second = diagram_llm("gpt-4.1"), diagram_llm("gpt-4o-mini")
+
+        await sequence_diagram_service.generate_sequence_diagram("plan", first)
+        await sequence_diagram_service.generate_sequence_diagram("plan", second)
+
+        second.ainvoke.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_generation_is_not_cached(self, primary_breaker, diagram_pipeline):
+        """Test a reply that doesn't parse is neither cached nor replayed on the next request"""
+        llm = diagram_llm(reply="not json")
+
+        first = await sequence_diagram_service.generate_sequence_diagram("plan", llm, max_iterations=1)
+        llm.ainvoke.return_value = MagicMock(content='{"messages": [{"from": "User", "to": "API", "text": "login"}]}')
+        second = await sequence_diagram_service.generate_sequence_diagram("plan", llm, max_iterations=1)
+
+        assert not first["success"] and second["success"]
+        assert llm.ainvoke.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_disabled_by_default(self, primary_breaker, diagram_pipeline):
+        """Test the shipped zero TTL always calls through to the LLM"""
+        llm = diagram_llm()
+
+        with patch.object(sequence_diagram_service.settings, "LLM_PROMPT_CACHE_TTL_SECONDS", 0):
+            await sequence_diagram_service.generate_sequence_diagram("plan", llm)
+            await sequence_diagram_service.generate_sequence_diagram("plan", llm)
+
+        assert llm.ainvoke.await_count == 2
+
+
+@pytest.mark.unit
+class TestSeleniumCircuitBreaker:
+    """Unit tests for the Selenium breaker's half-open probe slot"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method", ["generate_svg_threadsafe", "validate_diagram_threadsafe"])
+    async def test_cancelled_probe_releases_slot(self, method):
+        """Test a probe cancelled mid-flight doesn't keep later requests locked out"""
+        breaker = sequence_diagram_service.GlobalDiagramGenerator()
+        breaker._circuit_state = sequence_diagram_service.CircuitState.HALF_OPEN
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        breaker._get_generator = hang
+        probe = asyncio.create_task(getattr(breaker, method)("User->API: login"))
+        await started.wait()
+        probe.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker._allow_request()
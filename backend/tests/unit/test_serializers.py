@@ -4,7 +4,9 @@ from unittest.mock import patch, MagicMock
 from bson import ObjectId
 from datetime import datetime, timezone
 
-from app.utils.serializers import calculate_plan_metrics
+from bson import DBRef
+
+from app.utils.serializers import calculate_plan_metrics, get_structured_project
 
 @pytest.mark.unit
 class TestSerializers:
@@ -217,6 +219,36 @@ class TestSerializers:
         assert metrics["task_count"] == 0
         assert metrics["subtask_count"] == 0
     
+    def test_calculate_plan_metrics_rounds_to_two_decimals(self):
+        """Test that the completion percentage is rounded to hundredths"""
+        milestones = [
+            {"name": "M1", "status": "completed", "tasks": []},
+            {"name": "M2", "status": "completed", "tasks": []},
+            {"name": "M3", "status": "not_started", "tasks": []}
+        ]
+        
+        assert calculate_plan_metrics(milestones)["completion_percentage"] == 66.67
+        assert calculate_plan_metrics(milestones[2:])["completion_percentage"] == 0.0
+    
+    @pytest.mark.asyncio
+    async def test_get_structured_project_access_check(self):
+        """Test that owners and collaborators (raw or DBRef references) pass and others are refused"""
+        owner, collaborator, stranger = ObjectId(), ObjectId(), ObjectId()
+        project = {
+            "_id": ObjectId(),
+            "name": "Raw Project",
+            "owner_id": owner,
+            "collaborator_ids": [DBRef("users", collaborator)],
+            "implementation_plan": {}
+        }
+        
+        for user_id in (owner, str(collaborator)):
+            result = await get_structured_project(str(project["_id"]), MagicMock(id=user_id), project=project)
+            assert result["id"] == str(project["_id"])
+        
+        with pytest.raises(PermissionError):
+            await get_structured_project(str(project["_id"]), MagicMock(id=stranger), project=project)
+    
     @pytest.mark.asyncio
     async def test_create_or_update_project_from_plan_mock(self):
         """Test project creation from plan data with proper mocking"""